@@ -0,0 +1,154 @@
+import glob
+import os
+import pickle
+import random
+import threading
+from forking import run_in_fork
+from organism import Organism
+
+
+def snapshot(simulation):
+    """The state needed to resume a simulation: the world, the engine settings, the counters and random streams."""
+    return {
+        'tick': simulation.ticks,
+        'environment': simulation.env,
+        'genome_factory': simulation.genome_factory,
+        'food_amount': simulation.food_amount,
+        'food_rate_per_area': simulation.food_rate_per_area,
+        'max_skip': simulation.max_skip,
+        'aggregation': simulation.aggregation,
+        'mate_radius': simulation.mate_radius,
+        'stats_interval': simulation.stats_interval,
+        'next_organism_id': Organism.next_id,
+        'random_state': random.getstate(),
+    }
+
+
+def write_file(path, data):
+    """Write data to path atomically: to a temporary file first, fsynced, then renamed over path."""
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as snapshot_file:
+        snapshot_file.write(data)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary, path)
+    if hasattr(os, 'O_DIRECTORY'):
+        # Make the rename itself durable
+        directory = os.open(os.path.dirname(path) or '.', os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+def load(path):
+    with open(path, 'rb') as snapshot_file:
+        return pickle.load(snapshot_file)
+
+
+def restore(simulation, path):
+    """Resume a headless simulation from a snapshot file written by Autosave."""
+    return apply_snapshot(simulation, load(path))
+
+
+def apply_snapshot(simulation, state):
+    """Put the simulation in the state of a snapshot() and return it."""
+    simulation.env = state['environment']
+    simulation.ticks = state['tick']
+    simulation.env.current_tick = state['tick']
+    simulation.genome_factory = state['genome_factory']
+    simulation.food_amount = state['food_amount']
+    simulation.food_rate_per_area = state['food_rate_per_area']
+    simulation.max_skip = state['max_skip']
+    simulation.aggregation = state['aggregation']
+    simulation.mate_radius = state['mate_radius']
+    simulation.stats_interval = state['stats_interval']
+    Organism.next_id = state['next_organism_id']
+    random.setstate(state['random_state'])
+    return simulation
+
+
+class Autosave:
+    """Saves the simulation every `every` ticks without stalling the tick loop.
+
+    Where os.fork is available the snapshot is taken by forking: the child sees a copy-on-write image of
+    the world frozen at that tick, pickles it, writes and fsyncs it, and exits while the parent keeps
+    simulating. Elsewhere the world is pickled on the calling thread and only writing happens in the
+    background. At most one save runs at a time; a save that falls due while the previous one is still
+    being written is skipped. The newest `keep` files named <prefix>_<tick>.pkl are kept.
+    """
+
+    def __init__(self, directory, every=10000, keep=3, prefix='autosave', use_fork=None):
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        self.prefix = prefix
+        self.use_fork = hasattr(os, 'fork') if use_fork is None else use_fork
+        os.makedirs(directory, exist_ok=True)
+        self.child = None  # Pid of the forked writer
+        self.writer = None  # Writer thread when not forking
+        self.saved = 0
+        self.skipped = 0
+        self.errors = []
+
+    def wants(self, tick):
+        return tick % self.every == 0
+
+    def path(self, tick):
+        return os.path.join(self.directory, f'{self.prefix}_{tick:09d}.pkl')
+
+    def snapshots(self):
+        """Snapshot files in the directory, oldest first."""
+        return sorted(glob.glob(os.path.join(self.directory, f'{self.prefix}_*.pkl')))
+
+    def busy(self):
+        """Reap a finished writer, without waiting, and tell whether one is still running."""
+        if self.child is not None:
+            pid, status = os.waitpid(self.child, os.WNOHANG)
+            if pid == 0:
+                return True
+            if os.waitstatus_to_exitcode(status) != 0:
+                self.errors.append(f'autosave writer exited with status {os.waitstatus_to_exitcode(status)}')
+            self.child = None
+        return self.writer is not None and self.writer.is_alive()
+
+    def save(self, simulation):
+        """Start saving the current state in the background; returns False if skipped."""
+        if self.busy():
+            self.skipped += 1
+            return False
+        path = self.path(simulation.ticks)
+        if self.use_fork:
+            self.child = run_in_fork(
+                lambda: self.write(path, pickle.dumps(snapshot(simulation), pickle.HIGHEST_PROTOCOL)))
+        else:
+            data = pickle.dumps(snapshot(simulation), pickle.HIGHEST_PROTOCOL)
+            self.writer = threading.Thread(target=self.write_in_thread, args=(path, data), name='autosave',
+                                           daemon=True)
+            self.writer.start()
+        self.saved += 1
+        return True
+
+    def write(self, path, data):
+        write_file(path, data)
+        # Rotate: drop the oldest snapshots beyond `keep`
+        for old_path in self.snapshots()[:-self.keep]:
+            os.remove(old_path)
+
+    def write_in_thread(self, path, data):
+        try:
+            self.write(path, data)
+        except Exception as error:  # Reported by close(), the simulation keeps running
+            self.errors.append(f'{path}: {error}')
+
+    def close(self):
+        """Wait for the save in progress to finish."""
+        if self.child is not None:
+            _, status = os.waitpid(self.child, 0)
+            if os.waitstatus_to_exitcode(status) != 0:
+                self.errors.append(f'autosave writer exited with status {os.waitstatus_to_exitcode(status)}')
+            self.child = None
+        if self.writer is not None:
+            self.writer.join()
+        if self.errors:
+            raise RuntimeError(f'{len(self.errors)} autosaves failed, first: {self.errors[0]}')
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import math
+import numpy as np
+import pygame
+
+
+def environment_colors(environment, xs, ys, gradient_width=10):
+    """Return the background RGB colors for arrays of world coordinates.
+
+    Vectorized version of Visualizer.precompute_environment.
+    """
+    light_level = environment.get_light_levels(xs, ys)
+    temperature = environment.get_temperatures(xs, ys)
+    temp_border1 = environment.temperature_border1
+    temp_border2 = environment.temperature_border2
+
+    # Calculate temperature influence and gradient
+    dist_to_border1 = np.abs(temperature - temp_border1)
+    dist_to_border2 = np.abs(temperature - temp_border2)
+    gradient_influence = np.where(dist_to_border1 < gradient_width, 1 - dist_to_border1 / gradient_width,
+                                  np.where(dist_to_border2 < gradient_width, 1 - dist_to_border2 / gradient_width, 0))
+    gradient_influence = np.where(temperature < temp_border2, 0, gradient_influence)
+    gradient_influence = np.where(temperature > temp_border1, 1, gradient_influence)
+
+    # Interpolate between cold (blue) and hot (red) and apply the light level
+    colors = np.zeros(np.shape(light_level) + (3,), dtype=np.uint8)
+    colors[..., 0] = (gradient_influence * 255).astype(np.uint8) * light_level
+    colors[..., 2] = ((1 - gradient_influence) * 255).astype(np.uint8) * light_level
+    return colors
+
+
+class BackgroundTiles:
+    """Background rendered in fixed-size tiles on demand, kept in an LRU cache with a memory cap.
+
+    Tiles are in zoomed pixel space, matching the scaled environment surface they replace.
+    """
+
+    def __init__(self, environment, tile_size=256, max_bytes=64 * 1024 * 1024, prefetch_per_frame=2):
+        self.env = environment
+        self.tile_size = tile_size
+        self.max_tiles = max(max_bytes // (tile_size * tile_size * 4), 1)
+        self.prefetch_per_frame = prefetch_per_frame
+        self.tiles = OrderedDict()  # (column, row) -> Surface, least recently used first
+        self.zoom_factor = None
+
+    def set_zoom(self, zoom_factor):
+        if zoom_factor != self.zoom_factor:
+            self.zoom_factor = zoom_factor
+            self.tiles.clear()
+
+    def tile_grid_size(self):
+        return (math.ceil(self.env.width * self.zoom_factor / self.tile_size),
+                math.ceil(self.env.height * self.zoom_factor / self.tile_size))
+
+    def render_tile(self, column, row):
+        """Render one tile from the environment light and temperature fields."""
+        size = self.tile_size
+        pixel_xs = column * size + np.arange(size) + 0.5
+        pixel_ys = row * size + np.arange(size) + 0.5
+        # surfarray is indexed [x, y]
+        world_xs = np.broadcast_to((pixel_xs / self.zoom_factor)[:, np.newaxis], (size, size))
+        world_ys = np.broadcast_to((pixel_ys / self.zoom_factor)[np.newaxis, :], (size, size))
+        tile = pygame.Surface((size, size))
+        pygame.surfarray.blit_array(tile, environment_colors(self.env, world_xs, world_ys))
+        return tile
+
+    def get_tile(self, column, row):
+        key = (column, row)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.render_tile(column, row)
+            self.tiles[key] = tile
+            while len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def visible_tiles(self, rect):
+        """Return the (column, row) keys of the tiles overlapping a rectangle in zoomed pixel space."""
+        columns, rows = self.tile_grid_size()
+        column0 = max(int(rect.left // self.tile_size), 0)
+        row0 = max(int(rect.top // self.tile_size), 0)
+        column1 = min(math.ceil(rect.right / self.tile_size), columns)
+        row1 = min(math.ceil(rect.bottom / self.tile_size), rows)
+        return [(column, row) for row in range(row0, row1) for column in range(column0, column1)]
+
+    def draw(self, screen, camera_x, camera_y, area=None):
+        """Draw the tiles covering a screen area (the whole screen by default)."""
+        area = pygame.Rect(area) if area is not None else screen.get_rect()
+        view = area.move(int(camera_x), int(camera_y))
+        blit_sequence = []
+        for column, row in self.visible_tiles(view):
+            tile_x = column * self.tile_size - int(camera_x)
+            tile_y = row * self.tile_size - int(camera_y)
+            tile = self.get_tile(column, row)
+            tile_area = area.move(-tile_x, -tile_y).clip(tile.get_rect())
+            blit_sequence.append((tile, (tile_x + tile_area.x, tile_y + tile_area.y), tile_area))
+        screen.blits(blit_sequence, doreturn=False)
+
+    def prefetch(self, screen_rect, camera_x, camera_y, direction):
+        """Render a few not-yet-cached tiles just beyond the view in the pan direction."""
+        dx, dy = direction
+        if not dx and not dy:
+            return
+        ahead = pygame.Rect(screen_rect).move(int(camera_x), int(camera_y))
+        ahead = ahead.move(int(math.copysign(self.tile_size, dx)) if dx else 0,
+                           int(math.copysign(self.tile_size, dy)) if dy else 0)
+        rendered = 0
+        for key in self.visible_tiles(ahead):
+            if rendered >= self.prefetch_per_frame:
+                break
+            if key not in self.tiles:
+                self.get_tile(*key)
+                rendered += 1
@@ -0,0 +1,125 @@
+import copy
+import os
+import pickle
+import random
+import time
+import traceback
+from types import MappingProxyType
+import numpy as np
+from autosave import apply_snapshot, snapshot
+from forking import run_in_fork
+from organism import Organism
+from simulaton import Simulation
+
+
+def double_food(simulation):
+    """Variant: twice as much food is spawned."""
+    simulation.food_amount *= 2
+    if simulation.food_rate_per_area is not None:
+        simulation.food_rate_per_area *= 2
+
+
+def remove_predators(simulation):
+    """Variant: every organism that eats prey is removed."""
+    for organism in [organism for organism in simulation.env.organisms if organism.food_types == 'prey']:
+        simulation.env.remove_organism(organism)
+
+
+def plain(value):
+    """Turn a read-only stats snapshot into plain dicts that can be pickled."""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: plain(item) for key, item in value.items()}
+    return value
+
+
+def summarize(simulation):
+    simulation.publish_stats()
+    return plain(simulation.stats_snapshot)
+
+
+def copy_simulation(simulation):
+    """A headless Simulation running on a deep copy of the state autosave would save.
+
+    The clock, command queue and visualizer are not copied.
+    """
+    state = copy.deepcopy(snapshot(simulation))
+    return apply_snapshot(Simulation(state['environment']), state)
+
+
+def run_branch(simulation, variant, ticks, seed, summary):
+    """Apply a variant to the simulation and run it headless; returns the summary of the final state."""
+    if seed is not None:
+        random.seed(seed)
+        simulation.env.rng = np.random.default_rng(seed)
+        if simulation.genome_factory is not None:
+            simulation.genome_factory.rng = simulation.env.rng
+    simulation.viz = None  # Branches never draw or save
+    simulation.autosave = None
+    variant(simulation)
+    # Measure the branch on its own, not together with the run it was forked from
+    simulation.stats_clock = (simulation.ticks, time.perf_counter())
+    simulation.phase_times = dict.fromkeys(simulation.phase_times, 0.0)
+    end_tick = simulation.ticks + ticks
+    while simulation.ticks < end_tick:
+        simulation.step()
+    return summary(simulation)
+
+
+def report_branch(read_end, write_end, simulation, variant, ticks, seed, summary):
+    """Run a branch in a forked child and send its outcome to the parent through the pipe."""
+    os.close(read_end)
+    try:
+        result = ('ok', run_branch(simulation, variant, ticks, seed, summary))
+    except BaseException:
+        result = ('error', traceback.format_exc())
+    with os.fdopen(write_end, 'wb') as pipe:
+        pickle.dump(result, pipe, pickle.HIGHEST_PROTOCOL)
+
+
+def branch(simulation, variants, ticks, seed=None, summary=summarize):
+    """Fork the running world into one child process per variant and return their summaries.
+
+    `variants` maps a name to a function that changes the forked Simulation, such as double_food
+    or remove_predators. Children share the parent's memory copy-on-write, so forking is near-instant
+    whatever the population size, and the parent keeps its own world untouched. Each child runs its
+    variant for `ticks` ticks and sends back `summary(simulation)`.
+
+    Without a seed every branch continues from the same random state, so differences between the
+    branches come from the variants rather than from chance; with a seed every branch is reseeded with it.
+    Returns {name: summary}; a branch that failed maps to a RuntimeError with the child's traceback.
+    """
+    if not hasattr(os, 'fork'):
+        # No copy-on-write processes here: run the branches one after another on copies
+        random_state = random.getstate()
+        next_id = Organism.next_id
+        results = {}
+        for name, variant in variants.items():
+            branch_simulation = copy_simulation(simulation)
+            random.setstate(random_state)
+            Organism.next_id = next_id
+            try:
+                results[name] = run_branch(branch_simulation, variant, ticks, seed, summary)
+            except Exception:
+                results[name] = RuntimeError(f'Branch {name!r} failed:\n{traceback.format_exc()}')
+        # Leave the running world's random stream and ids as if no branch had run
+        random.setstate(random_state)
+        Organism.next_id = next_id
+        return results
+
+    children = {}
+    for name, variant in variants.items():
+        read_end, write_end = os.pipe()
+        pid = run_in_fork(lambda: report_branch(read_end, write_end, simulation, variant, ticks, seed, summary))
+        os.close(write_end)
+        children[name] = (pid, read_end)
+
+    results = {}
+    for name, (pid, read_end) in children.items():
+        with os.fdopen(read_end, 'rb') as pipe:
+            try:
+                outcome, result = pickle.load(pipe)
+            except EOFError:
+                outcome, result = 'error', 'branch exited without a result'
+        os.waitpid(pid, 0)
+        results[name] = result if outcome == 'ok' else RuntimeError(f'Branch {name!r} failed:\n{result}')
+    return results
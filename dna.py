@@ -1,12 +1,37 @@
 import random
+import weakref
+from types import MappingProxyType
+
+FOOD_TYPES = ('plant', 'prey')
+# Genes DNA.mutate scales by a random factor between 0.9 and 1.1
+SCALED_GENES = ('initial_size', 'metabolism_rate', 'food_sense_distance', 'activeness')
 
 
 class DNA:
+    # Hash-consing table: identical gene sets share one DNA object while any organism uses it
+    interned = weakref.WeakValueDictionary()
+    mutation_chance = 0.1  # 10% chance for each gene to mutate
+
     def __init__(self, genes=None):
-        # Initialize with a dictionary of genes
+        # Initialize with a dictionary of genes, read-only since genomes may be shared
         if genes is None:
             genes = {}
-        self.genes = genes
+        self.genes = MappingProxyType(genes)
+        self.decoded_traits = None  # Memoized by Traits.decode_dna
+
+    @classmethod
+    def intern(cls, genes):
+        """Return the shared DNA for this gene set, creating it if no live one exists."""
+        key = tuple(sorted(genes.items()))
+        dna = cls.interned.get(key)
+        if dna is None:
+            dna = cls(genes)
+            cls.interned[key] = dna
+        return dna
+
+    def __reduce__(self):
+        # The read-only genes cannot be pickled as they are; save a plain dict and intern it again on load
+        return DNA.intern, (dict(self.genes),)
 
     def get_gene(self, gene_type):
         """Retrieve the value of a specific gene."""
@@ -26,15 +51,16 @@ class DNA:
             'max_age': random.randint(1000, 1200),  # Add max_age gene with random lifespan between 100 and 1000 ticks
             # 'speed_modifier': random.uniform(1.0, 1.5)
         }
-        return cls(genes)
+        return cls.intern(genes)
 
     def mutate(self):
-        """Create a mutated copy of the DNA."""
-        mutated_genes = self.genes.copy()
-        mutation_chance = 0.1  # 10% chance for each gene to mutate
+        """Return a mutated copy of the DNA, or this DNA itself if no gene mutated."""
+        mutated_genes = None
 
-        for gene in mutated_genes:
-            if random.random() < mutation_chance:
+        for gene in self.genes:
+            if random.random() < self.mutation_chance:
+                if mutated_genes is None:
+                    mutated_genes = self.genes.copy()
                 if gene == 'initial_size':
                     mutated_genes[gene] *= random.uniform(0.9, 1.1)
                 elif gene == 'metabolism_rate':
@@ -48,7 +74,7 @@ class DNA:
                 elif gene == 'food_sense_distance':
                     mutated_genes[gene] *= random.uniform(0.9, 1.1)
                 elif gene == 'food_types':
-                    mutated_genes[gene] = random.choice(['plant', 'prey'])
+                    mutated_genes[gene] = random.choice(FOOD_TYPES)
                 # elif gene == 'aggressiveness':
                 #     mutated_genes[gene] *= random.uniform(0.9, 1.1)
                 # elif gene == 'social_behavior':
@@ -63,4 +89,34 @@ class DNA:
                 elif gene == 'activeness':
                     mutated_genes[gene] *= random.uniform(0.9, 1.1)
 
-        return DNA(mutated_genes)
+        if mutated_genes is None:
+            return self  # Genomes are immutable, so an unmutated child shares its parent's
+        return DNA.intern(mutated_genes)
+
+    def unchanged_chance(self):
+        """Probability that mutate() returns this DNA: no gene it changes was changed.
+
+        Only the scaled genes and food_types are ever changed, and a mutated food_types may be redrawn
+        as the same type.
+        """
+        chance = 1.0
+        for gene in self.genes:
+            if gene in SCALED_GENES:
+                chance *= 1 - self.mutation_chance
+            elif gene == 'food_types':
+                chance *= 1 - self.mutation_chance * (1 - 1 / len(FOOD_TYPES))
+        return chance
+
+    def crossover(self, other):
+        """Return two children, with each gene swapped between the parents with probability 0.5."""
+        if not self.genes or not other.genes:
+            return self, other
+
+        # Perform crossover, in gene order so a seeded run always swaps the same genes
+        child1_genes = self.genes.copy()
+        child2_genes = other.genes.copy()
+        for gene_type in self.genes:
+            if gene_type in other.genes and random.random() > 0.5:
+                child1_genes[gene_type], child2_genes[gene_type] = other.genes[gene_type], self.genes[gene_type]
+
+        return DNA.intern(child1_genes), DNA.intern(child2_genes)
@@ -1,67 +1,360 @@
 import random
 import math
+import numpy as np
+from food_field import FoodField
+from organism import Organism
+from spatial_grid import SpatialGrid
 
 
 class Environment:
-    def __init__(self, width, height):
+    def __init__(self, width, height, field_resolution=None):
         self.width = width
         self.height = height
         self.center_x = width / 2
         self.center_y = height / 2
+        # Light and temperature are precomputed on grids with cells of field_resolution world units,
+        # by default at least 4 units and coarse enough to keep the grids within 1024 cells per side
+        if field_resolution is None:
+            field_resolution = max(4, math.ceil(max(width, height) / 1024))
+        self.field_resolution = field_resolution
+        self.fields_stale = True
+        self.light_grid = None
+        self.temperature_grid = None
         self.temperature_border1 = 20
         self.temperature_border2 = 10
         self.light_radius = min(width, height) / 2  # Radius of light circle
         self.food_positions = []
         self.food_energy = {}  # Map positions to energy levels
         self.organisms = []
+        self.track_food_changes = False  # Record food additions/removals for incremental consumers
+        self.food_changes = []  # (position, added) pairs since the last drain
+        self.food_version = 0  # Incremented whenever food is added or removed
+        self.rng = np.random.default_rng()  # Generator for batched, array-based sampling
+        self.food_field = None  # Raster food model, replaces the food items when enabled
+        # Optional food limits, see set_food_limits
+        self.food_lifetime = None  # Ticks before uneaten food expires
+        self.food_decay_rate = None  # Energy lost per tick since the food appeared
+        self.food_capacity = None  # Maximum food items in the world
+        self.food_region_size = None  # Side of the square regions with their own cap
+        self.food_region_capacity = None  # Maximum food items per region
+        self.food_spawn_tick = {}  # Position -> tick the food appeared, when lifetimes or decay are on
+        self.food_expiry = {}  # Timing wheel of tick -> (position, spawn tick) of food expiring or fully decayed then
+        self.food_region_counts = {}  # Region -> food items in it, when regions are capped
+        self.death_schedule = None  # Timing wheel of tick -> organisms dying of old age, when scheduled at birth
+        self.current_tick = 0
+        self.birth_queue = None  # (parent, x, y) births to create in one batch, when batched births are on
+        self.mating_queue = None  # Fertile organisms waiting for a mate this tick, when reproduction is sexual
+        self.merge_births = False  # Unmutated children join their parent's group, when aggregation is on
+        self.flock_grid = None  # Grid of organisms for finding flockmates, when flocking is on
+        self.flock_radius = 30
+        self.flock_alignment = 0.3  # Weight of the flockmates' mean heading
+        self.flock_cohesion = 0.3  # Weight of the pull towards the flockmates' centre
+
+    @property
+    def temperature_border1(self):
+        return self._temperature_border1
+
+    @temperature_border1.setter
+    def temperature_border1(self, value):
+        self._temperature_border1 = value
+        self.fields_stale = True
+
+    @property
+    def temperature_border2(self):
+        return self._temperature_border2
+
+    @temperature_border2.setter
+    def temperature_border2(self, value):
+        self._temperature_border2 = value
+        self.fields_stale = True
+
+    @property
+    def light_radius(self):
+        return self._light_radius
+
+    @light_radius.setter
+    def light_radius(self, value):
+        self._light_radius = value
+        self.fields_stale = True
+
+    def update_fields(self):
+        """Recompute the light and temperature grids if a field parameter changed."""
+        if not self.fields_stale:
+            return
+        columns = math.ceil(self.width / self.field_resolution)
+        rows = math.ceil(self.height / self.field_resolution)
+        # Sample each cell at its centre
+        xs = (np.arange(columns) + 0.5) * self.field_resolution
+        ys = (np.arange(rows) + 0.5) * self.field_resolution
+
+        distance_from_center = np.hypot(xs[np.newaxis, :] - self.center_x, ys[:, np.newaxis] - self.center_y)
+        self.light_grid = np.clip(1 - distance_from_center / self.light_radius, 0, None)
+
+        # Temperature changes linearly from the left border to the right border
+        temperature_range = self.temperature_border2 - self.temperature_border1
+        temperature_row = self.temperature_border1 + xs / self.width * temperature_range
+        self.temperature_grid = np.broadcast_to(temperature_row, (rows, columns)).copy()
+
+        # Nested lists keep scalar lookups at plain Python indexing speed; temperature only depends on x
+        self.light_rows = self.light_grid.tolist()
+        self.temperature_columns = temperature_row.tolist()
+        self.field_scale = 1 / self.field_resolution
+        self.field_rows = rows
+        self.field_columns = columns
+        self.fields_stale = False
+
+    def field_cell(self, x, y):
+        """Return the (row, column) of the field grid cell containing (x, y), clamped to the grid."""
+        column = min(max(int(x * self.field_scale), 0), self.field_columns - 1)
+        row = min(max(int(y * self.field_scale), 0), self.field_rows - 1)
+        return row, column
+
+    def field_cells(self, xs, ys):
+        """Vectorized field_cell for arrays of coordinates."""
+        columns = np.clip((np.asarray(xs) / self.field_resolution).astype(np.intp), 0, self.light_grid.shape[1] - 1)
+        rows = np.clip((np.asarray(ys) / self.field_resolution).astype(np.intp), 0, self.light_grid.shape[0] - 1)
+        return rows, columns
 
     def get_light_level(self, x, y):
-        """Calculate the light level at coordinates (x, y)."""
-        distance_from_center = math.sqrt((x - self.center_x) ** 2 + (y - self.center_y) ** 2)
-        if distance_from_center > self.light_radius:
-            return 0
-        else:
-            return 1 - (distance_from_center / self.light_radius)
+        """Return the light level at coordinates (x, y)."""
+        if self.fields_stale:
+            self.update_fields()
+        column = int(x * self.field_scale)
+        row = int(y * self.field_scale)
+        if not (0 <= row < self.field_rows and 0 <= column < self.field_columns):
+            row, column = self.field_cell(x, y)  # Clamp points outside the world only
+        return self.light_rows[row][column]
 
     def get_temperature(self, x, y):
-        """Calculate the temperature at coordinates (x, y)."""
-        # Calculate the temperature range
-        temperature_range = self.temperature_border2 - self.temperature_border1
+        """Return the temperature at coordinates (x, y)."""
+        if self.fields_stale:
+            self.update_fields()
+        column = int(x * self.field_scale)
+        if not 0 <= column < self.field_columns:
+            column = self.field_cell(x, y)[1]
+        return self.temperature_columns[column]
+
+    def get_light_levels(self, xs, ys):
+        """Return the light levels for arrays of x and y coordinates."""
+        if self.fields_stale:
+            self.update_fields()
+        return self.light_grid[self.field_cells(xs, ys)]
+
+    def get_temperatures(self, xs, ys):
+        """Return the temperatures for arrays of x and y coordinates."""
+        if self.fields_stale:
+            self.update_fields()
+        return self.temperature_grid[self.field_cells(xs, ys)]
+
+    def enable_food_field(self, cell_size=10, **kwargs):
+        """Switch to the raster food model, storing plant energy on a grid of cell_size cells."""
+        self.food_field = FoodField(self.width, self.height, cell_size=cell_size, **kwargs)
+        return self.food_field
+
+    def set_food_limits(self, lifetime=None, decay_rate=None, capacity=None, region_size=None, region_capacity=None):
+        """Configure food expiry, energy decay and world or per-region caps; None disables a limit.
 
-        # Distance from the left border (x = 0) to the current x-coordinate
-        distance_from_left_border = x / self.width
+        Food is removed when its lifetime ends or when decay has taken all its energy, whichever is first.
+        """
+        self.food_lifetime = lifetime
+        self.food_decay_rate = decay_rate
+        self.food_capacity = capacity
+        self.food_region_size = region_size if region_capacity is not None else None
+        self.food_region_capacity = region_capacity if region_size is not None else None
+        # Existing food is treated as if it appeared now
+        self.food_spawn_tick = {}
+        self.food_expiry = {}
+        self.food_region_counts = {}
+        for position in self.food_positions:
+            self.register_food(position, self.food_energy.get(position))
 
-        # Calculate temperature based on the position
-        return self.temperature_border1 + distance_from_left_border * temperature_range
+    def food_region(self, position):
+        return position[0] // self.food_region_size, position[1] // self.food_region_size
+
+    def food_region_full(self, position):
+        return self.food_region_counts.get(self.food_region(position), 0) >= self.food_region_capacity
+
+    def register_food(self, position, energy=None):
+        """Record a new food item in the bookkeeping of the enabled food limits."""
+        if self.food_lifetime is not None or self.food_decay_rate is not None:
+            self.food_spawn_tick[position] = self.current_tick
+        expiry = None
+        if self.food_lifetime is not None:
+            expiry = self.current_tick + self.food_lifetime
+        if self.food_decay_rate and energy is not None:
+            # From this tick on the food has no energy left
+            decayed = self.current_tick + math.ceil(energy / self.food_decay_rate)
+            expiry = decayed if expiry is None else min(expiry, decayed)
+        if expiry is not None:
+            self.food_expiry.setdefault(expiry, []).append((position, self.current_tick))
+        if self.food_region_capacity is not None:
+            region = self.food_region(position)
+            self.food_region_counts[region] = self.food_region_counts.get(region, 0) + 1
+
+    def unregister_food(self, position):
+        self.food_spawn_tick.pop(position, None)
+        if self.food_region_capacity is not None:
+            region = self.food_region(position)
+            self.food_region_counts[region] = self.food_region_counts.get(region, 1) - 1
+
+    def expire_food(self, tick):
+        """Remove, in one batch, the food whose lifetime ends or whose energy has decayed at the given tick."""
+        # Entries for food that was eaten, and maybe replaced by new food at the same spot, are skipped
+        expiring = {position for position, spawn_tick in self.food_expiry.pop(tick, ())
+                    if self.food_spawn_tick.get(position) == spawn_tick}
+        if not expiring:
+            return
+        remaining = [position for position in self.food_positions if position not in expiring]
+        for position in expiring:
+            self.food_energy.pop(position, None)
+            self.unregister_food(position)
+        removed_count = len(self.food_positions) - len(remaining)
+        if self.track_food_changes:
+            self.food_changes.extend((position, False) for position in self.food_positions if position in expiring)
+        self.food_positions = remaining
+        self.food_version += removed_count
 
     def add_food(self):
         """Add food at a random location in the environment with a random energy value."""
+        if self.food_capacity is not None and len(self.food_positions) >= self.food_capacity:
+            return
         x = random.randint(0, self.width - 1)
         y = random.randint(0, self.height - 1)
         energy = random.uniform(20, 40)  # Energy value between 10 and 30
+        if self.food_region_capacity is not None and self.food_region_full((x, y)):
+            return
+        self.register_food((x, y), energy)
         self.food_positions.append((x, y))
         self.food_energy[(x, y)] = energy
+        self.food_version += 1
+        if self.track_food_changes:
+            self.food_changes.append(((x, y), True))
+
+    def add_food_batch(self, n):
+        """Add n food items at once, with positions and energies generated as arrays."""
+        if self.food_capacity is not None:
+            n = min(n, self.food_capacity - len(self.food_positions))
+        if n <= 0:
+            return
+        xs = self.rng.integers(0, self.width, n)
+        ys = self.rng.integers(0, self.height, n)
+        energies = self.rng.uniform(20, 40, n)
+        positions = list(zip(xs.tolist(), ys.tolist()))
+        if self.food_region_capacity is not None:
+            accepted = []
+            for index, position in enumerate(positions):
+                if not self.food_region_full(position):
+                    self.register_food(position, float(energies[index]))
+                    accepted.append(index)
+            positions = [positions[index] for index in accepted]
+            energies = energies[accepted]
+        elif self.food_lifetime is not None or self.food_decay_rate is not None:
+            for position, energy in zip(positions, energies.tolist()):
+                self.register_food(position, energy)
+        self.food_positions.extend(positions)
+        self.food_energy.update(zip(positions, energies.tolist()))
+        self.food_version += 1
+        if self.track_food_changes:
+            self.food_changes.extend((position, True) for position in positions)
+
+    def food_count_for_area(self, rate_per_area, area_unit=1_000_000):
+        """Convert a spawn rate per area_unit square world units into an item count for this world.
+
+        The fractional part is rounded stochastically so the expected density is exact.
+        """
+        expected = rate_per_area * self.width * self.height / area_unit
+        count = int(expected)
+        if random.random() < expected - count:
+            count += 1
+        return count
 
     def add_organism(self, organism):
         """Add an organism to be displayed."""
         self.organisms.append(organism)
+        if self.death_schedule is not None:
+            self.schedule_death(organism)
+
+    def enable_flocking(self, radius=30, alignment=0.3, cohesion=0.3):
+        """Let wandering social organisms align with and move towards social organisms of their diet nearby."""
+        self.flock_grid = SpatialGrid(radius)
+        self.flock_grid.update(self.organisms)
+        self.flock_radius = radius
+        self.flock_alignment = alignment
+        self.flock_cohesion = cohesion
+
+    def enable_scheduled_death(self):
+        """Sample every organism's natural death tick once instead of rolling the hazard each tick."""
+        self.death_schedule = {}
+        for organism in self.organisms:
+            self.schedule_death(organism)
+
+    def schedule_death(self, organism):
+        death_age = Organism.sample_death_age(organism.max_age)
+        death_tick = self.current_tick + max(death_age - organism.age, 1)
+        self.death_schedule.setdefault(death_tick, []).append(organism)
+
+    def expire_organisms(self, tick):
+        """Advance to the given tick and kill the organisms whose natural death falls on it."""
+        self.current_tick = tick
+        for organism in self.death_schedule.pop(tick, ()):
+            organism.alive = False
+
+    def aggregate_organisms(self, radius, age_tolerance, max_group):
+        """Merge living organisms with the same genome, nearby and of similar age, into groups.
+
+        Organisms within the same radius-sized cell merge when their ages differ by at most
+        age_tolerance ticks. Groups that grew beyond max_group members are split in two.
+        """
+        groups = {}  # (genome, cell) -> groups that may still absorb organisms
+        merged = False
+        for organism in self.organisms:
+            if not organism.alive:
+                continue
+            candidates = groups.setdefault((organism.dna, int(organism.x // radius), int(organism.y // radius)), [])
+            for group in candidates:
+                if abs(group.age - organism.age) <= age_tolerance:
+                    group.absorb(organism)
+                    merged = True
+                    break
+            else:
+                candidates.append(organism)
+        if merged:
+            # Filter in place, the visualizer holds a reference to this list
+            self.organisms[:] = [organism for organism in self.organisms if organism.count]
+
+        for organism in [organism for organism in self.organisms if organism.count > max_group]:
+            while organism.count > max_group:
+                self.organisms.append(organism.split())
 
     def get_food_positions(self):
         return self.food_positions
 
     def get_food_energy(self, position):
         """Return the energy value of food at a given position."""
+        if self.food_decay_rate is not None and position in self.food_spawn_tick:
+            age = self.current_tick - self.food_spawn_tick[position]
+            return max(self.food_energy.get(position, 0) - self.food_decay_rate * age, 0)
         return self.food_energy.get(position, 0)
 
     def remove_food(self, position):
         """Remove food from a specific location after it's consumed."""
         if position in self.food_positions:
             self.food_positions.remove(position)
+            self.unregister_food(position)
+            self.food_version += 1
+            if self.track_food_changes:
+                self.food_changes.append((position, False))
             try:
                 del self.food_energy[position]
             except KeyError as e:
                 print(f'Food removal error at {position}')
 
+    def drain_food_changes(self):
+        """Return the food additions and removals recorded since the last call, in order."""
+        changes = self.food_changes
+        self.food_changes = []
+        return changes
+
     def get_organisms(self):
         return self.organisms
 
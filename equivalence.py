@@ -0,0 +1,189 @@
+import hashlib
+import math
+import random
+import struct
+import numpy as np
+from environment import Environment
+from genome_factory import GenomeFactory
+from organism import Organism
+from simulaton import Simulation
+
+# Per-organism state compared between engines, in this order
+ORGANISM_FIELDS = ('x', 'y', 'energy', 'size', 'speed', 'age', 'alive', 'fertile_development')
+SUMMARY_METRICS = ('population', 'predators', 'food', 'mean_energy', 'mean_size',
+                   'metabolism_rate', 'food_sense_distance', 'activeness')
+
+
+def reference(simulation):
+    """The reference engine: the simulation exactly as it is built."""
+
+
+def build_simulation(seed, width=1200, height=800, organisms=200, food_amount=5):
+    """Build a world from a seed; the same seed always gives the same world and random streams."""
+    random.seed(seed)
+    Organism.next_id = 0
+    env = Environment(width, height)
+    env.rng = np.random.default_rng(seed)
+    genomes = GenomeFactory(env.rng).create_initial(organisms)
+    for index in range(len(genomes)):
+        env.add_organism(Organism(genomes.dna(index), random.uniform(0, width - 1),
+                                  random.uniform(0, height - 1), 30, env))
+    simulation = Simulation(env)
+    simulation.food_amount = food_amount
+    return simulation
+
+
+def organism_state(organism, decimals=None):
+    values = tuple(getattr(organism, field) for field in ORGANISM_FIELDS)
+    if decimals is not None:
+        values = tuple(round(value, decimals) for value in values)
+    return values
+
+
+def state_hash(env, decimals=None):
+    """Hash the state of every organism and food item; equal hashes mean equal worlds."""
+    digest = hashlib.blake2b(digest_size=16)
+    for organism in env.organisms:
+        digest.update(struct.pack('q', organism.id))
+        digest.update(repr(organism_state(organism, decimals)).encode())
+    digest.update(repr(env.food_positions).encode())
+    return digest.hexdigest()
+
+
+def first_divergence(reference_env, candidate_env, decimals=None):
+    """Describe the first organism, by id, whose state differs between the two worlds."""
+    reference_states = {organism.id: organism_state(organism, decimals) for organism in reference_env.organisms}
+    candidate_states = {organism.id: organism_state(organism, decimals) for organism in candidate_env.organisms}
+    for organism_id in sorted(reference_states.keys() | candidate_states.keys()):
+        expected = reference_states.get(organism_id)
+        actual = candidate_states.get(organism_id)
+        if expected is None or actual is None:
+            return {'organism': organism_id, 'field': 'exists', 'reference': expected is not None,
+                    'candidate': actual is not None}
+        for field, expected_value, actual_value in zip(ORGANISM_FIELDS, expected, actual):
+            if expected_value != actual_value:
+                return {'organism': organism_id, 'field': field, 'reference': expected_value,
+                        'candidate': actual_value}
+    if reference_env.food_positions != candidate_env.food_positions:
+        return {'organism': None, 'field': 'food_positions', 'reference': len(reference_env.food_positions),
+                'candidate': len(candidate_env.food_positions)}
+    return {'organism': None, 'field': 'order', 'reference': None, 'candidate': None}
+
+
+class Lane:
+    """One simulation with its own copy of the global random state and organism id counter.
+
+    Both engines use the random module and Organism.next_id, so running two simulations side by side
+    in one process needs these swapped in and out around every tick.
+    """
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.random_state = random.getstate()
+        self.next_id = Organism.next_id
+
+    def step(self):
+        random.setstate(self.random_state)
+        Organism.next_id = self.next_id
+        self.simulation.step()
+        self.random_state = random.getstate()
+        self.next_id = Organism.next_id
+
+
+def compare_exact(candidate, ticks=500, seed=0, decimals=None, baseline=reference, **world):
+    """Run the baseline and candidate engines in lockstep from the same seed, comparing every tick.
+
+    An engine is a function that configures a freshly built Simulation, e.g. Simulation.enable_batched_births.
+    `decimals` rounds the compared floats, for engines that reorder floating-point arithmetic.
+    Returns a report with the first divergent tick and organism, or divergent_tick None if none diverged.
+    """
+    lanes = []
+    for engine in (baseline, candidate):
+        simulation = build_simulation(seed, **world)
+        engine(simulation)
+        lanes.append(Lane(simulation))
+    reference_env = lanes[0].simulation.env
+    candidate_env = lanes[1].simulation.env
+
+    for tick in range(1, ticks + 1):
+        for lane in lanes:
+            lane.step()
+        if state_hash(reference_env, decimals) != state_hash(candidate_env, decimals):
+            return {'equivalent': False, 'divergent_tick': tick,
+                    'divergence': first_divergence(reference_env, candidate_env, decimals)}
+    return {'equivalent': True, 'divergent_tick': None, 'divergence': None}
+
+
+def summary(simulation):
+    organisms = simulation.env.organisms
+    count = len(organisms)
+    values = {
+        'population': count,
+        'predators': sum(1 for organism in organisms if organism.food_types == 'prey'),
+        'food': len(simulation.env.food_positions),
+        'mean_energy': sum(organism.energy for organism in organisms) / count if count else 0.0,
+        'mean_size': sum(organism.size for organism in organisms) / count if count else 0.0,
+    }
+    for gene in ('metabolism_rate', 'food_sense_distance', 'activeness'):
+        values[gene] = sum(organism.dna.get_gene(gene) for organism in organisms) / count if count else 0.0
+    return values
+
+
+def compare_statistics(candidate, ticks=500, runs=8, seed=0, threshold=3.0, baseline=reference, **world):
+    """Compare the engines by summary statistics over several seeds, for engines that are not exact.
+
+    Each engine runs `runs` worlds seeded seed, seed + 1, ...; a metric is flagged when Welch's t statistic
+    between the two sets of final values exceeds `threshold`.
+    """
+    finals = []
+    for engine in (baseline, candidate):
+        results = []
+        for run in range(runs):
+            simulation = build_simulation(seed + run, **world)
+            engine(simulation)
+            while simulation.ticks < ticks:
+                simulation.step()
+            results.append(summary(simulation))
+        finals.append(results)
+
+    metrics = {}
+    for metric in SUMMARY_METRICS:
+        expected = np.array([result[metric] for result in finals[0]], dtype=float)
+        actual = np.array([result[metric] for result in finals[1]], dtype=float)
+        error = math.sqrt(expected.var(ddof=1) / runs + actual.var(ddof=1) / runs) if runs > 1 else 0.0
+        difference = actual.mean() - expected.mean()
+        t = difference / error if error else (0.0 if difference == 0 else math.inf)
+        metrics[metric] = {'reference': float(expected.mean()), 'candidate': float(actual.mean()),
+                           't': float(t), 'divergent': abs(t) > threshold}
+    return {'equivalent': not any(metric['divergent'] for metric in metrics.values()), 'metrics': metrics}
+
+
+def compare_mutation_rates(births=20000, group_size=1000, seed=0, threshold=3.0):
+    """Compare the share of mutated children between single births and group births of the aggregation mode.
+
+    A group birth draws its unmutated children at once instead of mutating every child, so both should
+    match DNA.unchanged_chance(). A rate is flagged when it is more than `threshold` standard errors from
+    the expected one.
+    """
+    simulation = build_simulation(seed, organisms=1)
+    env = simulation.env
+    parent = env.organisms[0]
+    dna = parent.dna
+    genes = dict(dna.genes)
+    expected = 1 - dna.unchanged_chance()
+
+    single = sum(dict(dna.mutate().genes) != genes for _ in range(births)) / births
+    parent.count = group_size
+    mutants = 0
+    for _ in range(births // group_size):
+        parent.fertile_development = 30
+        parent.reproduce(dna)
+        mutants += sum(child.count for child in env.organisms[1:] if dict(child.dna.genes) != genes)
+        del env.organisms[1:]
+    grouped = mutants / (births // group_size * group_size)
+
+    error = math.sqrt(expected * (1 - expected) / births)
+    rates = {'expected': expected, 'single': single, 'group': grouped}
+    return {'equivalent': all(abs(rate - expected) <= threshold * error for rate in (single, grouped)),
+            'rates': rates}
+
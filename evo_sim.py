@@ -3,11 +3,13 @@ from visualizer import Visualizer
 from simulaton import Simulation
 from dna import DNA
 from organism import Organism
+from genome_factory import GenomeFactory
 
 
-def create_organism(x, y, env):
+def create_organism(x, y, env, dna=None):
     # Create DNA for the organism
-    dna = DNA.create_initial_dna()  # Generates random DNA
+    if dna is None:
+        dna = DNA.create_initial_dna()  # Generates random DNA
     return Organism(dna, x=x, y=y, energy=30, environment=env)
 
 
@@ -19,12 +21,13 @@ def main():
     visualizer = Visualizer(environment=env, screen_width=1200, screen_height=750)
 
     num_organisms = 100
+    genomes = GenomeFactory(env.rng).create_initial(num_organisms)  # All starting genomes in one batch
     for i in range(num_organisms):
         # Generate positions in a grid-like pattern for simplicity
         x = (i * (env.width // num_organisms))  # % env.width
         y = (i * (env.height // num_organisms))  # % env.height
 
-        org = create_organism(x, y, env)
+        org = create_organism(x, y, env, genomes.dna(i))
 
         # Add organism to the visualizer
         env.add_organism(org)
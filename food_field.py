@@ -0,0 +1,65 @@
+import math
+import numpy as np
+
+
+class FoodField:
+    """Plant energy stored as a 2D grid instead of individual food items.
+
+    Memory and per-tick cost depend only on the grid resolution, so the field can hold
+    any amount of plant matter.
+    """
+
+    def __init__(self, width, height, cell_size=10, energy_per_tick=30.0, max_energy=40.0, regrowth_rate=0.0,
+                 bite_size=20.0, initial_fill=0.025, min_sensed_energy=0.1):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.columns = math.ceil(width / cell_size)
+        self.rows = math.ceil(height / cell_size)
+        self.max_energy = max_energy  # Energy a fully grown cell holds
+        # Growth spread evenly over the cells every tick. The default matches the food items: 5 items of
+        # 20 to 40 energy every 5 ticks
+        self.seed_energy = energy_per_tick / (self.rows * self.columns)
+        self.regrowth_rate = regrowth_rate  # Extra logistic growth rate per tick, for fields that spread by themselves
+        self.bite_size = bite_size  # Maximum energy eaten from a cell in one tick
+        self.min_sensed_energy = min_sensed_energy  # Cells poorer than this are not worth approaching
+        self.energy = np.full((self.rows, self.columns), max_energy * initial_fill, dtype=np.float32)
+
+    def regrow(self):
+        """Grow every cell by one tick."""
+        energy = self.energy
+        if self.regrowth_rate:
+            energy += self.regrowth_rate * energy * (1 - energy / self.max_energy)
+        energy += self.seed_energy
+        np.minimum(energy, self.max_energy, out=energy)
+
+    def cell_at(self, x, y):
+        """Return the (row, column) of the cell containing (x, y), clamped to the grid."""
+        column = min(max(int(x / self.cell_size), 0), self.columns - 1)
+        row = min(max(int(y / self.cell_size), 0), self.rows - 1)
+        return row, column
+
+    def cell_center(self, row, column):
+        return (column + 0.5) * self.cell_size, (row + 0.5) * self.cell_size
+
+    def consume(self, x, y, bites=1):
+        """Eat up to bites * bite_size energy from the cell containing (x, y) and return the amount eaten."""
+        row, column = self.cell_at(x, y)
+        eaten = min(float(self.energy[row, column]), self.bite_size * bites)
+        self.energy[row, column] -= eaten
+        return eaten
+
+    def sense(self, x, y, radius):
+        """Return the centre of the richest cell in the square window of the given radius around (x, y).
+
+        Returns None if no cell in the window holds at least min_sensed_energy.
+        """
+        row, column = self.cell_at(x, y)
+        reach = int(radius / self.cell_size)
+        row0, column0 = max(row - reach, 0), max(column - reach, 0)
+        window = self.energy[row0:row + reach + 1, column0:column + reach + 1]
+        index = int(window.argmax())
+        window_row, window_column = divmod(index, window.shape[1])
+        if window[window_row, window_column] < self.min_sensed_energy:
+            return None
+        return self.cell_center(row0 + window_row, column0 + window_column)
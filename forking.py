@@ -0,0 +1,23 @@
+import os
+import random
+
+
+def run_in_fork(function):
+    """Call function() in a forked child process and return the child's pid.
+
+    The child sees a copy-on-write image of the parent's memory and starts from the parent's
+    random state, which the random module would otherwise reseed after the fork. It exits with
+    status 0 if function returned and 1 if it raised, without running the parent's exit
+    handlers, e.g. closing its display.
+    """
+    random_state = random.getstate()
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            random.setstate(random_state)
+            function()
+        except BaseException:
+            status = 1
+        os._exit(status)
+    return pid
@@ -0,0 +1,76 @@
+import os
+import struct
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pygame
+
+
+def png_chunk(chunk_type, data):
+    return struct.pack('!I', len(data)) + chunk_type + data + struct.pack('!I', zlib.crc32(chunk_type + data))
+
+
+def encode_png(pixels, width, height, level=6):
+    """Encode raw RGB bytes as a PNG. zlib releases the GIL, so threads encode in parallel."""
+    stride = width * 3
+    # Every scanline starts with filter type 0 (None)
+    scanlines = b''.join(b'\0' + pixels[row * stride:(row + 1) * stride] for row in range(height))
+    header = struct.pack('!IIBBBBB', width, height, 8, 2, 0, 0, 0)  # 8-bit RGB
+    return (b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header) +
+            png_chunk(b'IDAT', zlib.compress(scanlines, level)) + png_chunk(b'IEND', b''))
+
+
+class FrameExporter:
+    """Captures rendered frames and compresses them to numbered PNGs on a pool of workers.
+
+    Frames are written to `directory` as frame_000123.png, or into a single zip archive if
+    `archive` is set. Capturing only copies the pixels; it blocks only when `max_pending`
+    frames are already waiting to be encoded.
+    """
+
+    def __init__(self, directory, every=10, workers=4, max_pending=8, archive=None, processes=False, level=6):
+        self.directory = directory
+        self.every = every  # Ticks between captured frames
+        self.level = level
+        os.makedirs(directory, exist_ok=True)
+        self.executor = (ProcessPoolExecutor if processes else ThreadPoolExecutor)(max_workers=workers)
+        self.pending = threading.BoundedSemaphore(max_pending)
+        self.archive = zipfile.ZipFile(os.path.join(directory, archive), 'w', zipfile.ZIP_STORED) if archive else None
+        self.archive_lock = threading.Lock()
+        self.errors = []
+        self.frames = 0
+
+    def wants(self, tick):
+        return tick % self.every == 0
+
+    def capture(self, surface, tick):
+        """Queue a copy of the surface for encoding as the frame for this tick."""
+        width, height = surface.get_size()
+        pixels = pygame.image.tobytes(surface, 'RGB')
+        self.pending.acquire()  # Back-pressure: wait while the encode queue is full
+        future = self.executor.submit(encode_png, pixels, width, height, self.level)
+        future.add_done_callback(lambda done: self.write(done, f'frame_{tick:06d}.png'))
+        self.frames += 1
+
+    def write(self, future, name):
+        try:
+            data = future.result()
+            if self.archive is not None:
+                with self.archive_lock:
+                    self.archive.writestr(name, data)
+            else:
+                with open(os.path.join(self.directory, name), 'wb') as frame_file:
+                    frame_file.write(data)
+        except Exception as error:  # Reported by close(), the simulation keeps running
+            self.errors.append((name, error))
+        finally:
+            self.pending.release()
+
+    def close(self):
+        """Wait for all queued frames to be written and release the workers."""
+        self.executor.shutdown(wait=True)
+        if self.archive is not None:
+            self.archive.close()
+        if self.errors:
+            raise RuntimeError(f'{len(self.errors)} frames failed to export, first: {self.errors[0]}')
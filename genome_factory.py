@@ -0,0 +1,107 @@
+import numpy as np
+from dna import DNA, FOOD_TYPES, SCALED_GENES
+
+FLOAT_GENES = ('initial_size', 'metabolism_rate', 'aggressiveness', 'food_sense_distance', 'activeness')
+GENE_NAMES = ('initial_size', 'metabolism_rate', 'food_types', 'aggressiveness', 'social_behavior',
+              'food_sense_distance', 'activeness', 'max_age')
+
+
+class GenomeBatch:
+    """Genes of many genomes stored column-wise as NumPy arrays.
+
+    food_types is stored as an index into FOOD_TYPES. Plain Python lists of every column are
+    built the first time rows are copied out as DNA, which makes copying every row cheap.
+    """
+
+    def __init__(self, columns, mutated=None):
+        self.columns = columns
+        self.mutated = mutated  # Per-row flags set by GenomeFactory.mutate
+        self.values = None
+
+    def __len__(self):
+        return len(self.columns['max_age'])
+
+    def gene_values(self):
+        """Return the genes as per-column Python lists with food_types decoded."""
+        if self.values is None:
+            values = {gene: column.tolist() for gene, column in self.columns.items()}
+            values['food_types'] = [FOOD_TYPES[code] for code in values['food_types']]
+            self.values = values
+        return self.values
+
+    def dna(self, index):
+        """Return the shared DNA for one row, so the organism holding it does not keep the whole batch alive."""
+        values = self.gene_values()
+        return DNA.intern({gene: column[index] for gene, column in values.items()})
+
+    def dnas(self):
+        return [self.dna(index) for index in range(len(self))]
+
+    def take(self, indices):
+        return GenomeBatch({gene: column[indices] for gene, column in self.columns.items()})
+
+    @classmethod
+    def from_dnas(cls, dnas):
+        """Gather the genes of a sequence of DNA objects into a batch."""
+        columns = {gene: [dna.get_gene(gene) for dna in dnas] for gene in GENE_NAMES}
+        columns['food_types'] = [FOOD_TYPES.index(food_type) for food_type in columns['food_types']]
+        return cls({
+            gene: np.array(values, dtype=np.float64 if gene in FLOAT_GENES else
+                           bool if gene == 'social_behavior' else np.int64)
+            for gene, values in columns.items()
+        })
+
+
+class GenomeFactory:
+    """Creates, mutates and crosses over genomes in batches, using the DNA gene distributions."""
+
+    def __init__(self, rng=None, mutation_chance=0.1):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.mutation_chance = mutation_chance
+
+    def create_initial(self, n):
+        """Create n random genomes, distributed like DNA.create_initial_dna."""
+        rng = self.rng
+        return GenomeBatch({
+            'initial_size': rng.uniform(2.0, 4.0, n),
+            'metabolism_rate': rng.uniform(0.2, 1.3, n),
+            'food_types': (rng.random(n) >= 0.9).astype(np.int64),  # 90% plant, 10% prey
+            'aggressiveness': rng.uniform(0.0, 1.0, n),
+            'social_behavior': rng.random(n) < 0.5,
+            'food_sense_distance': rng.uniform(25.0, 35.0, n),
+            'activeness': rng.uniform(0.4, 1.0, n),
+            'max_age': rng.integers(1000, 1201, n),
+        })
+
+    def mutate(self, parents):
+        """Return a batch of children, one mutated copy per parent genome, like DNA.mutate.
+
+        The batch's `mutated` flags mark the children that differ from their parent.
+        """
+        rng = self.rng
+        n = len(parents)
+        columns = {gene: column.copy() for gene, column in parents.columns.items()}
+        any_mutated = np.zeros(n, dtype=bool)
+        for gene in SCALED_GENES:
+            mutated = rng.random(n) < self.mutation_chance
+            columns[gene][mutated] *= rng.uniform(0.9, 1.1, int(mutated.sum()))
+            any_mutated |= mutated
+        mutated = rng.random(n) < self.mutation_chance
+        columns['food_types'][mutated] = rng.integers(0, len(FOOD_TYPES), int(mutated.sum()))
+        any_mutated |= mutated & (columns['food_types'] != parents.columns['food_types'])
+        return GenomeBatch(columns, any_mutated)
+
+    def crossover(self, first, second):
+        """Cross over two equally sized batches pairwise, swapping each gene with probability 0.5.
+
+        Returns the two batches of children, like DNA.crossover applied to every pair.
+        """
+        rng = self.rng
+        n = len(first)
+        first_children = {}
+        second_children = {}
+        for gene in GENE_NAMES:
+            swapped = rng.random(n) > 0.5
+            first_children[gene] = np.where(swapped, second.columns[gene], first.columns[gene])
+            second_children[gene] = np.where(swapped, first.columns[gene], second.columns[gene])
+        return GenomeBatch(first_children), GenomeBatch(second_children)
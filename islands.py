@@ -0,0 +1,135 @@
+import multiprocessing
+import queue
+import random
+import time
+import numpy as np
+from environment import Environment
+from genome_factory import GenomeBatch, GenomeFactory
+from organism import Organism
+from simulaton import Simulation
+
+
+def island_targets(topology, index, count):
+    """Return the islands that island `index` sends migrants to."""
+    if topology == 'ring':
+        return [(index + 1) % count] if count > 1 else []
+    if topology == 'full':
+        return [other for other in range(count) if other != index]
+    return list(topology.get(index, ()))
+
+
+def pack_migrants(organisms):
+    """Serialize organisms compactly as gene columns plus energies, without environment references."""
+    return GenomeBatch.from_dnas([organism.dna for organism in organisms]).columns, \
+        np.array([organism.energy for organism in organisms])
+
+
+def unpack_migrants(migrants, env):
+    """Create organisms at random positions in env from packed gene columns and energies."""
+    columns, energies = migrants
+    genomes = GenomeBatch(columns)
+    for index, energy in enumerate(energies.tolist()):
+        env.add_organism(Organism(genomes.dna(index), random.uniform(0, env.width - 1),
+                                  random.uniform(0, env.height - 1), energy, env))
+
+
+def run_island(index, config, inboxes, results):
+    """Process entry point: run one island headless, exchanging migrants every migration_interval ticks."""
+    seed = config['seed'] + index
+    random.seed(seed)
+    env = Environment(config['width'], config['height'])
+    env.rng = np.random.default_rng(seed)
+    genomes = GenomeFactory(env.rng).create_initial(config['organisms'])
+    for organism_index in range(len(genomes)):
+        env.add_organism(Organism(genomes.dna(organism_index), random.uniform(0, env.width - 1),
+                                  random.uniform(0, env.height - 1), 30, env))
+
+    sim = Simulation(env)
+    sim.food_amount = config['food_amount']
+    if config['scheduled_death']:
+        sim.enable_scheduled_death()
+    if config['batched_births']:
+        sim.enable_batched_births()
+
+    targets = island_targets(config['topology'], index, len(inboxes))
+    for inbox in inboxes:
+        # Migrants still buffered for an island that already finished must not block this one from exiting
+        inbox.cancel_join_thread()
+    emigrants = immigrants = 0
+    started = time.perf_counter()
+    while sim.ticks < config['ticks']:
+        sim.step()
+        if sim.ticks % config['migration_interval']:
+            continue
+
+        # Send a few random organisms to every neighbour
+        for target in targets:
+            alive = [organism for organism in env.organisms if organism.is_alive()]
+            leaving = random.sample(alive, min(config['migrants'], len(alive)))
+            if leaving:
+                for organism in leaving:
+                    env.remove_organism(organism)
+                inboxes[target].put(pack_migrants(leaving))
+                emigrants += len(leaving)
+
+        # Take in whatever has arrived, without waiting for slower islands
+        while True:
+            try:
+                migrants = inboxes[index].get_nowait()
+            except queue.Empty:
+                break
+            unpack_migrants(migrants, env)
+            immigrants += len(migrants[1])
+
+    organisms = env.organisms
+    results.put({
+        'island': index,
+        'ticks': sim.ticks,
+        'ticks_per_second': sim.ticks / (time.perf_counter() - started),
+        'population': len(organisms),
+        'predators': sum(1 for organism in organisms if organism.food_types == 'prey'),
+        'emigrants': emigrants,
+        'immigrants': immigrants,
+        'mean_genes': {gene: float(np.mean([organism.dna.get_gene(gene) for organism in organisms]))
+                       for gene in ('metabolism_rate', 'food_sense_distance', 'activeness', 'initial_size')}
+        if organisms else {},
+    })
+
+
+class IslandModel:
+    """Runs independent environments in separate processes, with periodic migration between them.
+
+    Every migration_interval ticks each island sends `migrants` organisms to each of its neighbours
+    in the topology: 'ring', 'full', or a dict mapping an island index to the indices it sends to.
+    """
+
+    def __init__(self, islands=4, width=2400, height=1500, organisms=100, food_amount=5,
+                 migration_interval=100, migrants=5, topology='ring', seed=0,
+                 scheduled_death=False, batched_births=False):
+        self.islands = islands
+        self.config = {
+            'width': width,
+            'height': height,
+            'organisms': organisms,
+            'food_amount': food_amount,
+            'migration_interval': migration_interval,
+            'migrants': migrants,
+            'topology': topology,
+            'seed': seed,
+            'scheduled_death': scheduled_death,
+            'batched_births': batched_births,
+        }
+
+    def run(self, ticks):
+        """Run every island for the given number of ticks and return their summaries, ordered by island."""
+        config = dict(self.config, ticks=ticks)
+        inboxes = [multiprocessing.Queue() for _ in range(self.islands)]
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=run_island, args=(index, config, inboxes, results))
+                     for index in range(self.islands)]
+        for process in processes:
+            process.start()
+        summaries = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return sorted(summaries, key=lambda summary: summary['island'])
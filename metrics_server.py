@@ -0,0 +1,239 @@
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+COMMANDS = ('pause', 'resume', 'fast_forward', 'stop')
+MAX_COMMAND_BYTES = 1024  # Longest command body or WebSocket frame accepted from a client
+
+INDEX_PAGE = """<!DOCTYPE html>
+<html><head><title>Evolution Simulator</title></head>
+<body>
+<button onclick="send('pause')">Pause</button>
+<button onclick="send('resume')">Resume</button>
+<button onclick="send('fast_forward 1000')">Fast-forward 1000</button>
+<pre id="stats">Connecting...</pre>
+<script>
+const socket = new WebSocket(`ws://${location.host}/stream`);
+socket.onmessage = (message) => {
+    document.getElementById('stats').textContent = JSON.stringify(JSON.parse(message.data), null, 2);
+};
+function send(command) { socket.send(command); }
+</script>
+</body></html>
+"""
+
+
+def to_json(snapshot):
+    """Serialize a (possibly nested) read-only statistics snapshot."""
+    return json.dumps(snapshot, default=dict)
+
+
+class MetricsServer:
+    """Local HTTP/WebSocket server streaming simulation statistics and accepting control commands.
+
+    Runs an asyncio event loop on its own thread. It only reads the immutable stats_snapshot the
+    simulation publishes and sends commands through the simulation's command queue, so it never
+    touches simulation state directly.
+
+    Endpoints:
+        GET /                     minimal browser dashboard
+        GET /stats                latest snapshot as JSON
+        POST /control?command=... queue a command (pause, resume, fast_forward&ticks=N, stop); the
+                                  parameters may also come as a form body
+        GET /stream               WebSocket; pushes snapshots at `rate` per second and accepts
+                                  text commands such as "pause" or "fast_forward 1000"
+
+    Requests that change the run must come from this server's own pages: a browser request whose
+    Origin is another site is refused, so other pages cannot pause or stop the run. Clients that
+    send no Origin, such as scripts, are accepted.
+    """
+
+    def __init__(self, simulation, host='127.0.0.1', port=8765, rate=2.0, stats_interval=10):
+        self.simulation = simulation
+        self.host = host
+        self.port = port
+        self.rate = rate  # Snapshots pushed per second on every WebSocket
+        self.stats_interval = stats_interval  # Ticks between snapshots published by the simulation
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+
+    def start(self):
+        """Start serving on a daemon thread and enable snapshot publishing in the simulation."""
+        if not self.simulation.stats_interval:
+            self.simulation.stats_interval = self.stats_interval
+        self.thread = threading.Thread(target=self.serve, name='metrics-server', daemon=True)
+        self.thread.start()
+        self.started.wait()
+        return self
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join()
+
+    def serve(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]  # Resolve port 0 to the bound port
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            # Cancel open connections before closing the loop
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def send_command(self, command, argument=None):
+        if command not in COMMANDS:
+            return False
+        if command == 'fast_forward':
+            # The tick count comes from the client, only a positive integer is accepted
+            try:
+                argument = int(argument)
+            except (TypeError, ValueError):
+                return False
+            if argument <= 0:
+                return False
+        self.simulation.commands.put((command, argument))
+        return True
+
+    def trusted_origin(self, headers):
+        """Whether the request comes from a page of this server, or from a client that sends no Origin."""
+        origin = headers.get('origin')
+        if origin is None:
+            return True
+        own_hosts = {f'{name}:{self.port}' for name in (self.host, 'localhost', '127.0.0.1')}
+        return urlsplit(origin).netloc in own_hosts
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                return
+
+            method = request_line[0]
+            url = urlsplit(request_line[1])
+            if url.path in ('/stream', '/control') and not self.trusted_origin(headers):
+                await self.respond(writer, '403 Forbidden', 'text/plain', 'Cross-origin requests are not allowed')
+            elif url.path == '/stream' and headers.get('upgrade', '').lower() == 'websocket':
+                await self.stream(reader, writer, headers)
+            elif url.path == '/stats':
+                await self.respond(writer, '200 OK', 'application/json', to_json(self.simulation.stats_snapshot))
+            elif url.path == '/control' and method != 'POST':
+                await self.respond(writer, '405 Method Not Allowed', 'text/plain', 'Use POST',
+                                   extra_headers='Allow: POST\r\n')
+            elif url.path == '/control':
+                await self.control(reader, writer, url, headers)
+            elif url.path == '/':
+                await self.respond(writer, '200 OK', 'text/html', INDEX_PAGE)
+            else:
+                await self.respond(writer, '404 Not Found', 'text/plain', 'Not found')
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, content_type, body, extra_headers=''):
+        body = body.encode()
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                     f'{extra_headers}Connection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+
+    async def control(self, reader, writer, url, headers):
+        """Queue the command given in the query string or the form body of a POST /control."""
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_COMMAND_BYTES:
+            await self.respond(writer, '400 Bad Request', 'text/plain', 'Invalid or too long body')
+            return
+        parameters = parse_qs(url.query)
+        if length:
+            parameters.update(parse_qs((await reader.readexactly(length)).decode('latin-1')))
+        command = parameters.get('command', [''])[0]
+        accepted = self.send_command(command, parameters.get('ticks', [None])[0])
+        await self.respond(writer, '200 OK' if accepted else '400 Bad Request', 'application/json',
+                           json.dumps({'accepted': accepted, 'command': command}))
+
+    async def stream(self, reader, writer, headers):
+        key = headers.get('sec-websocket-key', '')
+        try:
+            valid_key = len(base64.b64decode(key, validate=True)) == 16
+        except ValueError:
+            valid_key = False
+        if not valid_key:
+            await self.respond(writer, '400 Bad Request', 'text/plain', 'Missing or invalid Sec-WebSocket-Key')
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest())
+        writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        await writer.drain()
+
+        receiver = asyncio.ensure_future(self.receive_commands(reader))
+        try:
+            last_snapshot = None
+            while not receiver.done():
+                snapshot = self.simulation.stats_snapshot
+                if snapshot is not None and snapshot is not last_snapshot:
+                    writer.write(self.websocket_frame(to_json(snapshot).encode()))
+                    await writer.drain()
+                    last_snapshot = snapshot
+                await asyncio.sleep(1 / self.rate)
+        finally:
+            receiver.cancel()
+
+    async def receive_commands(self, reader):
+        """Read client frames until the connection closes, queueing text frames as commands.
+
+        A frame longer than MAX_COMMAND_BYTES closes the connection.
+        """
+        while True:
+            header = await reader.readexactly(2)
+            opcode = header[0] & 0x0F
+            length = header[1] & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', await reader.readexactly(8))[0]
+            if length > MAX_COMMAND_BYTES:
+                return
+            mask = await reader.readexactly(4) if header[1] & 0x80 else b'\0\0\0\0'
+            payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(await reader.readexactly(length)))
+            if opcode == 0x8:  # Close
+                return
+            if opcode == 0x1:  # Text
+                command, _, argument = payload.decode('utf-8', 'replace').strip().partition(' ')
+                self.send_command(command, argument or None)
+
+    @staticmethod
+    def websocket_frame(payload):
+        """Build an unmasked, final text frame."""
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x81, length)
+        elif length < 1 << 16:
+            header = struct.pack('!BBH', 0x81, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x81, 127, length)
+        return header + payload
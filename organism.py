@@ -1,4 +1,5 @@
 from traits import Traits
+import copy
 import random
 import math
 
@@ -6,6 +7,7 @@ import math
 class Organism:
 
     next_id = 0
+    mutant_samples = 8  # Most distinct mutant genomes among the children of one group birth
 
     def __init__(self, dna, x, y, energy, environment):
         self.traits = Traits.decode_dna(dna)  # Decode DNA into traits
@@ -25,6 +27,7 @@ class Organism:
         # self.food_required_to_grow = traits.get('food_required_to_grow')
         # self.food_required_to_be_fertile = traits.get('food_required_to_be_fertile')
         self.activeness = dna.get_gene('activeness')  # gene for movement activity
+        self.social_behavior = dna.get_gene('social_behavior')  # Social organisms flock when flocking is on
         self.direction = (random.uniform(-1, 1), random.uniform(-1, 1))  # Initial random direction
         self.hunger = 50  # Start with 50 hunger
         self.age = 0  # Initialize age to 0
@@ -34,6 +37,26 @@ class Organism:
         self.max_energy = self.traits.get('max_energy')
         self.reproduction_rate = self.traits.get('reproduction_rate')
         self.fertile_development = 0
+        self.growth_coefficient = Traits.growth_coefficient(dna)  # size = coefficient / (max_age - age) while growing
+        self.metabolism_speed = self.metabolism_rate * 50  # speed = metabolism_speed / size
+        self.mature = False  # Set once size and speed have stopped changing
+        # Individuals this organism stands for; above 1 it is a group whose members share one state
+        self.count = 1
+        # Distance to the nearest food or prey at the last sensing, used by the activity scheduler
+        self.target_distance = 0.0
+        self.updated_at = environment.current_tick  # Last tick this organism was updated
+        self.asleep_until = 0  # Ticks up to this one are skipped and integrated when it wakes
+        self.mate_queued_at = None  # Tick this organism last joined the mating queue
+
+    def __getstate__(self):
+        # Traits are a read-only view memoized on the DNA, so they are decoded again when loading
+        state = self.__dict__.copy()
+        del state['traits']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.traits = Traits.decode_dna(self.dna)
 
     def move_towards(self, target_x, target_y):
         """Move the organism towards a target point (target_x, target_y)."""
@@ -57,43 +80,94 @@ class Organism:
         death_probability = 1 - math.exp(-((age - 0.6 * max_age) / (0.4 * max_age)) * k)
         return death_probability
 
-    def update(self, environment):
-        """Update the organism's state."""
+    @staticmethod
+    def sample_death_age(max_age, k=2):
+        """Sample the age at which the calculate_death_probability hazard kills an organism.
+
+        The per-tick hazard grows linearly past 60% of max_age, so the cumulative hazard is a
+        quadratic in age and an exponential draw can be inverted in closed form.
+        """
+        onset = 0.6 * max_age
+        first_age = max(math.ceil(onset), 1)  # First age with a non-negative hazard term
+        offset = first_age - onset
+        steepness = k / (0.4 * max_age)
+        # Smallest n with steepness * (n * offset + n * (n - 1) / 2) >= exponential draw
+        target = random.expovariate(1) / steepness
+        root = -(offset - 0.5) + math.sqrt((offset - 0.5) ** 2 + 2 * target)
+        return first_age + max(math.ceil(root), 1) - 1
+
+    def update(self, environment, sense=True):
+        """Update the organism's state.
+
+        With sense=False the organism does not look for food or prey and only wanders, which is what
+        it does on every tick with nothing in range. target_distance is set to the distance of the
+        nearest food or prey when sensing, in range or not.
+        """
         if not self.is_alive():
             return
 
         self.age += 1  # Increment age each tick
 
-        # Check for death probability
-        if random.random() < self.calculate_death_probability(self.age, self.max_age):
-            self.alive = False
-            return
+        # Check for death probability, unless natural death was scheduled at birth
+        if environment.death_schedule is None:
+            if self.count > 1:
+                # Every member of a group dies independently
+                death_probability = self.calculate_death_probability(self.age, self.max_age)
+                if death_probability:
+                    self.count -= int(environment.rng.binomial(self.count, death_probability))
+                    if self.count == 0:
+                        self.alive = False
+                        return
+            elif random.random() < self.calculate_death_probability(self.age, self.max_age):
+                self.alive = False
+                return
 
         closest_food = None
         closest_distance = float('inf')
         moved = False
 
-        if 'plant' in self.food_types:
+        if sense and 'plant' in self.food_types and environment.food_field is not None:
+            self.target_distance = 0.0  # The field can regrow anywhere nearby
+            richest_cell = environment.food_field.sense(self.x, self.y, self.food_sense_distance)
+            if richest_cell:
+                closest_food = richest_cell
+                closest_distance = math.hypot(richest_cell[0] - self.x, richest_cell[1] - self.y)
+        elif sense and 'plant' in self.food_types:
+            # The nearest food overall, which is the closest food sensed if within sensing distance
+            nearest_food = None
+            nearest_distance = float('inf')
             for food_x, food_y in environment.get_food_positions():
                 distance = math.hypot(food_x - self.x, food_y - self.y)
-                if distance < closest_distance and distance <= self.food_sense_distance:
-                    closest_food = (food_x, food_y)
-                    closest_distance = distance
+                if distance < nearest_distance:
+                    nearest_food = (food_x, food_y)
+                    nearest_distance = distance
+            self.target_distance = nearest_distance
+            if nearest_distance <= self.food_sense_distance:
+                closest_food = nearest_food
+                closest_distance = nearest_distance
 
-        if 'prey' in self.food_types:
+        if sense and 'prey' in self.food_types:
+            nearest_prey = None
+            nearest_distance = float('inf')
             for prey in environment.get_organisms():
                 if prey != self and prey.dna.get_gene('food_types') != 'prey' and prey.is_alive():
                     distance = math.hypot(prey.x - self.x, prey.y - self.y)
-                    if distance < closest_distance and distance <= self.food_sense_distance:
-                        closest_food = (prey.x, prey.y)
-                        closest_distance = distance
+                    if distance < nearest_distance:
+                        nearest_prey = (prey.x, prey.y)
+                        nearest_distance = distance
+            self.target_distance = nearest_distance
+            if nearest_distance < closest_distance and nearest_distance <= self.food_sense_distance:
+                closest_food = nearest_prey
+                closest_distance = nearest_distance
 
         if closest_food:
             self.move_towards(*closest_food)
             moved = True
 
             if math.hypot(closest_food[0] - self.x, closest_food[1] - self.y) < self.size:
-                if 'plant' in self.food_types:
+                if 'plant' in self.food_types and environment.food_field is not None:
+                    self.graze(environment.food_field, closest_food)
+                elif 'plant' in self.food_types:
                     food_energy = environment.get_food_energy(closest_food)
                     self.consume_food(environment, closest_food, food_energy)
                 elif 'prey' in self.food_types:
@@ -105,6 +179,8 @@ class Organism:
             # Decide whether to move based on activeness
             if random.random() < self.activeness:
                 moved = True
+                if self.social_behavior and environment.flock_grid is not None:
+                    self.flock(environment)
                 # Add small random perturbations to direction more frequently
                 self.direction = (
                     self.direction[0] + random.uniform(-0.3, 0.3),
@@ -134,8 +210,13 @@ class Organism:
 
         self.metabolize(moved)
 
-        self.speed = Traits.calculate_speed(self.dna, self)
-        self.size = Traits.calculate_size(self.dna, self)
+        if not self.mature:
+            # Same values as Traits.calculate_speed / calculate_size, from the precomputed curves
+            self.speed = self.metabolism_speed / self.size
+            if self.age < self.max_age / 2:
+                self.size = self.growth_coefficient / (self.max_age - self.age)
+            else:
+                self.mature = True  # Size is final and speed was just computed from it
 
         if (self.age > self.max_age * 0.1) and self.energy >= 31:
             self.fertile_development += 1
@@ -144,13 +225,70 @@ class Organism:
         if (self.age > self.max_age * 0.1) and self.fertile_development >= 30:
             self.reproduce(self.dna)
 
+    def flock(self, environment):
+        """Turn towards the mean heading and the centre of the social organisms of the same diet nearby."""
+        radius = environment.flock_radius
+        heading_x = heading_y = centre_x = centre_y = 0.0
+        flockmates = 0
+        for other in environment.flock_grid.near(self.x, self.y, radius):
+            if other is not self and other.social_behavior and other.food_types == self.food_types:
+                if math.hypot(other.x - self.x, other.y - self.y) <= radius:
+                    heading_x += other.direction[0]
+                    heading_y += other.direction[1]
+                    centre_x += other.x
+                    centre_y += other.y
+                    flockmates += 1
+        if flockmates:
+            alignment = environment.flock_alignment / flockmates
+            cohesion = environment.flock_cohesion / (flockmates * radius)  # Full weight from the edge
+            self.direction = (
+                self.direction[0] + heading_x * alignment + (centre_x - self.x * flockmates) * cohesion,
+                self.direction[1] + heading_y * alignment + (centre_y - self.y * flockmates) * cohesion
+            )
+
     def reproduce(self, dna):
         """Attempt to reproduce if conditions are met."""
-        child_dna = dna.mutate()  # Mutate the DNA slightly
+        if self.environment.mating_queue is not None and self.count == 1:
+            # Simulation.match_mates pairs this organism with a mate at the end of the tick
+            if self.mate_queued_at != self.environment.current_tick:
+                self.mate_queued_at = self.environment.current_tick
+                self.environment.mating_queue.append(self)
+            return
         child_x = self.x + random.uniform(-5, 5)
         child_y = self.y + random.uniform(-5, 5)
-        child_energy = 30  # Transfer energy to the child
         self.fertile_development -= 30  # Deduct energy from the parent
+        if self.count > 1:
+            # Every member has a child. The children mutate() would leave unchanged form one group with the
+            # parent's genome; the mutated ones are split among a bounded sample of mutant genomes, one group each
+            unchanged = int(self.environment.rng.binomial(self.count, dna.unchanged_chance()))
+            mutated = self.count - unchanged
+            samples = min(mutated, self.mutant_samples)
+            children = {}
+            if unchanged and self.environment.merge_births:
+                self.add_newborns(unchanged)
+            elif unchanged:
+                children[dna] = unchanged
+            genes = dna.genes
+            for index in range(samples):
+                child_dna = dna.mutate()
+                while child_dna.genes == genes:  # Draw a genome given that some gene changed
+                    child_dna = dna.mutate()
+                share = mutated // samples + (1 if index < mutated % samples else 0)
+                children[child_dna] = children.get(child_dna, 0) + share
+            for child_dna, count in children.items():
+                child = Organism(child_dna, child_x, child_y, 30, self.environment)
+                child.count = count
+                self.environment.add_organism(child)
+            return
+        if self.environment.birth_queue is not None:
+            # The simulation mutates all queued genomes in one batch at the end of the tick
+            self.environment.birth_queue.append((self, child_x, child_y))
+            return
+        child_dna = dna.mutate()  # Mutate the DNA slightly
+        if child_dna is dna and self.environment.merge_births:
+            self.add_newborns(1)
+            return
+        child_energy = 30  # Transfer energy to the child
         child = Organism(child_dna, child_x, child_y, child_energy, self.environment)
         self.environment.add_organism(child)
         # print(f'{self.id}, energy {self.energy} reproduced {child.id}')
@@ -161,21 +299,81 @@ class Organism:
         return self.alive
 
     def consume_food(self, environment, food_position, food_energy):
-        """Consume food and decrease hunger."""
+        """Consume food and decrease hunger.
+
+        A group stands for members that would each find their own food, so it also eats the nearest
+        other food it senses, up to one item per member, and shares the energy among its members.
+        """
+        if self.count > 1:
+            sensed = []
+            for position in environment.get_food_positions():
+                distance = math.hypot(position[0] - self.x, position[1] - self.y)
+                if distance <= self.food_sense_distance and position != food_position:
+                    sensed.append((distance, position))
+            sensed.sort()
+            for _, position in sensed[:self.count - 1]:
+                food_energy += environment.get_food_energy(position)
+                environment.remove_food(position)
+        food_energy /= self.count
         self.hunger -= food_energy  # Decrease hunger by a fixed amount
         environment.remove_food(food_position)
         # print(f' {self.id}, energy {self.energy} consumed plant for {food_energy}')
         self.energy += food_energy
 
+    def graze(self, food_field, position):
+        """Eat from the food field cell at the given position."""
+        food_energy = food_field.consume(*position, bites=self.count) / self.count
+        self.hunger -= food_energy
+        self.energy += food_energy
+
     def consume_prey(self, environment, prey):
-        """Consume another organism."""
-        self.hunger -= prey.size  # Decrease hunger by prey size or energy
-        prey.alive = False  # Kill the prey
+        """Consume another organism, or one member of a prey group per member of this group."""
+        eaten = min(self.count, prey.count)
+        share = eaten / self.count  # Prey eaten per member of this group
+        self.hunger -= prey.size * share  # Decrease hunger by prey size or energy
+        prey.count -= eaten
+        if prey.count == 0:
+            prey.alive = False  # Kill the prey
         # print(f' {self.id}, energy {self.energy} consumed prey {prey.id} for {prey.energy}')
 
-        self.energy += prey.energy  # Gain energy from prey
+        self.energy += prey.energy * share  # Gain energy from prey
         # print('consumed energy', prey.energy)
 
+    def absorb(self, other):
+        """Merge another organism with the same genome into this group, keeping the average state."""
+        total = self.count + other.count
+        self.x = (self.x * self.count + other.x * other.count) / total
+        self.y = (self.y * self.count + other.y * other.count) / total
+        self.energy = (self.energy * self.count + other.energy * other.count) / total
+        self.hunger = (self.hunger * self.count + other.hunger * other.count) / total
+        self.fertile_development = (self.fertile_development * self.count +
+                                    other.fertile_development * other.count) / total
+        self.count = total
+        other.count = 0
+        other.alive = False
+
+    def add_newborns(self, count):
+        """Make unmutated children members of this group instead of separate organisms.
+
+        They bring a newborn's energy, hunger and fertility into the group average, and take the
+        group's position and age, so they reproduce and die with it.
+        """
+        total = self.count + count
+        self.energy = (self.energy * self.count + 30 * count) / total
+        self.hunger = (self.hunger * self.count + 50 * count) / total
+        self.fertile_development = self.fertile_development * self.count / total
+        self.count = total
+
+    def split(self):
+        """Split half of this group off into a new group that heads its own way."""
+        twin = copy.copy(self)
+        twin.id = Organism.next_id
+        Organism.next_id += 1
+        twin.count = self.count // 2
+        self.count -= twin.count
+        twin.direction = (random.uniform(-1, 1), random.uniform(-1, 1))
+        return twin
+
     def metabolize(self, moved):
         """Reduce energy over time based on metabolism rate."""
         if moved:
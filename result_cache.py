@@ -0,0 +1,141 @@
+import glob
+import hashlib
+import json
+import os
+import time
+from autosave import write_file
+from equivalence import build_simulation, summary
+
+# Modules whose source decides the results of a headless run
+SIMULATION_MODULES = ('dna.py', 'environment.py', 'equivalence.py', 'food_field.py', 'genome_factory.py',
+                      'organism.py', 'simulaton.py', 'spatial_grid.py', 'traits.py')
+DEFAULT_CONFIG = {
+    'width': 1200,
+    'height': 800,
+    'organisms': 200,
+    'food_amount': 5,
+    'seed': 0,
+    'ticks': 1000,
+    'summary_interval': 10,  # Ticks between recorded summaries
+    'scheduled_death': False,
+    'batched_births': False,
+    'activity_scheduling': False,
+    'flocking': False,
+    'sexual_reproduction': False,
+}
+
+
+def code_version():
+    """Hash of the simulation source, so cached results are not reused after the code changed."""
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in SIMULATION_MODULES:
+        with open(os.path.join(directory, name), 'rb') as module_file:
+            digest.update(name.encode() + b'\0' + module_file.read())
+    return digest.hexdigest()
+
+
+def config_key(config, version=None):
+    """Content address of a run: a hash of its full configuration and the code version."""
+    full_config = dict(DEFAULT_CONFIG, **config)
+    text = json.dumps(full_config, sort_keys=True) + (version or code_version())
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def run_experiment(config):
+    """Run one configuration headless and return its final and per-interval summaries."""
+    config = dict(DEFAULT_CONFIG, **config)
+    simulation = build_simulation(config['seed'], config['width'], config['height'], config['organisms'],
+                                  config['food_amount'])
+    if config['scheduled_death']:
+        simulation.enable_scheduled_death()
+    if config['batched_births']:
+        simulation.enable_batched_births()
+    if config['activity_scheduling']:
+        simulation.enable_activity_scheduling()
+    if config['flocking']:
+        simulation.env.enable_flocking()
+    if config['sexual_reproduction']:
+        simulation.enable_sexual_reproduction()
+
+    series = []
+    started = time.perf_counter()
+    while simulation.ticks < config['ticks']:
+        simulation.step()
+        if simulation.ticks % config['summary_interval'] == 0:
+            series.append(dict(summary(simulation), tick=simulation.ticks))
+    return {
+        'config': config,
+        'final': dict(summary(simulation), tick=simulation.ticks),
+        'series': series,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+class ResultCache:
+    """On-disk cache of headless run results, one JSON file per configuration key.
+
+    Entries older than max_age seconds are dropped, and when the cache outgrows max_bytes the least
+    recently used entries go first. Reading an entry counts as using it.
+    """
+
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.version = code_version()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path) as result_file:
+                result = json.load(result_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if time.time() - os.path.getmtime(path) > self.max_age:
+            os.remove(path)
+            return None
+        os.utime(path, (time.time(), os.path.getmtime(path)))  # Record the access for eviction
+        return result
+
+    def put(self, key, result):
+        write_file(self.path(key), json.dumps(result).encode())
+        self.evict()
+
+    def evict(self):
+        """Remove expired entries, then the least recently used ones until the cache fits max_bytes."""
+        now = time.time()
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            status = os.stat(path)
+            if now - status.st_mtime > self.max_age:
+                os.remove(path)
+            else:
+                entries.append((max(status.st_atime, status.st_mtime), status.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def run(self, config):
+        """Return the result of a configuration, running it only if it is not cached yet."""
+        key = config_key(config, self.version)
+        result = self.get(key)
+        if result is None:
+            result = run_experiment(config)
+            self.put(key, result)
+        return result
+
+    def sweep(self, configs):
+        """Run every configuration, reusing cached ones; an interrupted sweep resumes where it stopped."""
+        return [self.run(config) for config in configs]
+
+    def missing(self, configs):
+        """The configurations of a sweep that are not cached yet."""
+        return [config for config in configs if not os.path.exists(self.path(config_key(config, self.version)))]
@@ -1,9 +1,18 @@
+import math
+import queue
+import random
+import time
+from types import MappingProxyType
+import numpy as np
 import pygame
 import pygame_gui
+from genome_factory import GenomeBatch, GenomeFactory
+from organism import Organism
+from spatial_grid import SpatialGrid
 
 
 class Simulation:
-    def __init__(self, environment, visualizer):
+    def __init__(self, environment, visualizer=None):
         self.env = environment
         self.viz = visualizer
         self.clock = pygame.time.Clock()
@@ -13,6 +22,22 @@ class Simulation:
         self.overlay_is_on = True
         self.controls_are_on = True
         self.running = True
+        self.frame_pending = True  # Whether anything changed since the last drawn frame
+        self.idle_fps = 30  # Loop rate while idle frames are being skipped
+        self.genome_factory = None  # Set when births are batched
+        self.food_rate_per_area = None  # Food per million square units every 5 ticks, overrides the slider when set
+        self.food_amount = int(visualizer.food_slider.get_current_value()) if visualizer else 5
+        # Statistics snapshots for external readers, published every stats_interval ticks when set
+        self.stats_interval = None
+        self.stats_snapshot = None
+        self.stats_clock = (0, time.perf_counter())
+        self.phase_times = {'food': 0.0, 'deaths': 0.0, 'organisms': 0.0, 'births': 0.0}
+        self.commands = queue.SimpleQueue()  # (command, argument) pairs from other threads
+        self.fast_forward_ticks = 0
+        self.autosave = None  # Background saver (autosave.Autosave) called every autosave.every ticks when set
+        self.aggregation = None  # (interval, radius, age tolerance, max group) when super-individuals are on
+        self.max_skip = None  # Longest run of skipped ticks for idle organisms, when activity scheduling is on
+        self.mate_radius = 30  # Distance within which fertile organisms find a mate in sexual reproduction
 
     def overlay_draw(self, organisms_count):
 
@@ -26,12 +51,12 @@ class Simulation:
         # self.viz.draw_text(f"Maximum energy: {max_energy:.1f}", (1000, 110))
 
         if organisms_count:
-            self.viz.draw_metabolism_graph()
-            self.viz.draw_food_sense_graph()
-            self.viz.draw_population_graph()
-            self.viz.draw_activeness_graph()
+            self.viz.draw_overlays()
 
     def proceed_organisms(self):
+        if self.max_skip:
+            self.proceed_organisms_by_activity()
+            return
         # Update organism positions
         for organism in self.env.organisms:
             if organism.is_alive():
@@ -39,49 +64,344 @@ class Simulation:
             else:
                 self.env.organisms.remove(organism)
 
-    def draw_organisms(self):
+    def proceed_organisms_by_activity(self):
+        """Update organisms with nothing in range on a coarser cadence.
+
+        An organism that sensed nothing sleeps for as many ticks as it provably cannot come within
+        sensing distance of the nearest food or prey, at most max_skip. On waking, the skipped ticks
+        are integrated as plain wandering, which is all it would have done on them.
+        """
+        env = self.env
+        tick = self.ticks
+        max_speed = max((organism.speed for organism in env.organisms), default=0)  # Fastest possible prey
+        for organism in env.organisms:
+            if not organism.is_alive():
+                env.organisms.remove(organism)
+                continue
+            if organism.asleep_until >= tick:
+                continue
+            for _ in range(tick - organism.updated_at - 1):
+                organism.update(env, sense=False)
+            organism.updated_at = tick
+            organism.update(env)
+
+            # Both may close in on each other: prey moving towards a predator, the organism towards food
+            closing_speed = organism.speed + (max_speed if 'prey' in organism.food_types else 0)
+            gap = organism.target_distance - organism.food_sense_distance - 5  # Births land up to 5 away
+            if closing_speed > 0 and gap > closing_speed:
+                organism.asleep_until = tick + int(min(gap / closing_speed, self.max_skip))
+
+    def wake_near(self, positions):
+        """Wake the sleeping plant eaters that may have come within sensing distance of new food."""
+        tick = self.ticks
         for organism in self.env.organisms:
-            # screen_x = organism.x - self.viz.camera_x
-            # screen_y = organism.y - self.viz.camera_y
-            # if 0 <= screen_x <= self.viz.screen_width and 0 <= screen_y <= self.viz.screen_height:
-            self.viz.draw_organism(organism)
+            if organism.asleep_until >= tick and 'plant' in organism.food_types:
+                # Where it would be now is within speed * skipped ticks of where it fell asleep
+                reach = organism.food_sense_distance + organism.speed * (tick - organism.updated_at)
+                if any(math.hypot(x - organism.x, y - organism.y) <= reach for x, y in positions):
+                    organism.asleep_until = tick - 1
+
+    def step(self):
+        """Advance the simulation by one tick."""
+        self.ticks += 1
+        self.env.current_tick = self.ticks
+        phase_start = time.perf_counter()
+        if self.env.food_expiry:
+            self.env.expire_food(self.ticks)
+        # Regrow the food field every tick, or add food items every 5 ticks
+        if self.env.food_field is not None:
+            self.env.food_field.regrow()
+        elif self.ticks % 5 == 0:
+            food_count = len(self.env.food_positions)
+            if self.food_rate_per_area is None:
+                self.env.add_food_batch(self.food_amount)
+            else:
+                self.env.add_food_batch(self.env.food_count_for_area(self.food_rate_per_area))
+            if self.max_skip and len(self.env.food_positions) > food_count:
+                self.wake_near(self.env.food_positions[food_count:])
+        phase_end = time.perf_counter()
+        self.phase_times['food'] += phase_end - phase_start
+
+        phase_start = phase_end
+        if self.env.death_schedule is not None:
+            self.env.expire_organisms(self.ticks)
+        phase_end = time.perf_counter()
+        self.phase_times['deaths'] += phase_end - phase_start
+
+        phase_start = phase_end
+        if self.env.flock_grid is not None:
+            self.env.flock_grid.update(self.env.organisms)  # Only organisms that changed cell are moved
+        self.proceed_organisms()
+        phase_end = time.perf_counter()
+        self.phase_times['organisms'] += phase_end - phase_start
+
+        phase_start = phase_end
+        if self.genome_factory is not None:
+            self.flush_births()
+        if self.env.mating_queue is not None:
+            self.match_mates()
+        if self.aggregation is not None and self.ticks % self.aggregation[0] == 0:
+            self.env.aggregate_organisms(*self.aggregation[1:])
+        self.phase_times['births'] += time.perf_counter() - phase_start
+
+        if self.stats_interval and self.ticks % self.stats_interval == 0:
+            self.publish_stats()
+        if self.autosave is not None and self.autosave.wants(self.ticks):
+            self.autosave.save(self)
+
+    def publish_stats(self):
+        """Replace stats_snapshot with a new read-only snapshot of the current statistics."""
+        ticks, started = self.stats_clock
+        now = time.perf_counter()
+        elapsed_ticks = max(self.ticks - ticks, 1)
+        organisms = self.env.organisms
+        population = sum(organism.count for organism in organisms)
+        predators = sum(organism.count for organism in organisms if organism.food_types == 'prey')
+        genes = {}
+        weights = np.fromiter((organism.count for organism in organisms), float, len(organisms))
+        for gene in ('metabolism_rate', 'food_sense_distance', 'activeness', 'initial_size', 'max_age'):
+            values = np.fromiter((organism.dna.get_gene(gene) for organism in organisms), float, len(organisms))
+            if len(values) and weights.sum():
+                counts, edges = np.histogram(values, bins=10, weights=weights)
+                counts = counts.astype(int)
+                genes[gene] = MappingProxyType({
+                    'mean': float(np.average(values, weights=weights)),
+                    'min': float(values.min()), 'max': float(values.max()),
+                    'counts': tuple(counts.tolist()), 'edges': tuple(edges.tolist()),
+                })
+        self.stats_snapshot = MappingProxyType({
+            'tick': self.ticks,
+            'paused': self.paused,
+            'population': population,
+            'agents': len(organisms),
+            'predators': predators,
+            'prey': population - predators,
+            'food': len(self.env.food_positions),
+            'ticks_per_second': (self.ticks - ticks) / (now - started) if now > started else 0.0,
+            'phase_ms': MappingProxyType({phase: total * 1000 / elapsed_ticks
+                                          for phase, total in self.phase_times.items()}),
+            'genes': MappingProxyType(genes),
+        })
+        self.stats_clock = (self.ticks, now)
+        self.phase_times = dict.fromkeys(self.phase_times, 0.0)
+
+    def set_paused(self, paused):
+        self.paused = paused
+        if self.viz:
+            self.viz.start_pause_button.set_text('Start' if paused else 'Pause')
+
+    def process_commands(self):
+        """Apply the commands queued by other threads, such as the metrics server."""
+        while True:
+            try:
+                command, argument = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if command == 'pause':
+                self.set_paused(True)
+            elif command == 'resume':
+                self.set_paused(False)
+            elif command == 'fast_forward':
+                try:
+                    ticks = int(argument or 0)
+                except (TypeError, ValueError):
+                    continue  # Malformed commands are ignored rather than stopping the loop
+                self.fast_forward_ticks += max(ticks, 0)
+            elif command == 'stop':
+                self.running = False
+
+    def run_headless(self, max_ticks=None):
+        """Run the simulation without a display, until stopped or max_ticks is reached."""
+        self.paused = False
+        while self.running and (max_ticks is None or self.ticks < max_ticks):
+            self.process_commands()
+            if self.fast_forward_ticks:
+                self.fast_forward_ticks -= 1
+                self.step()
+            elif self.paused:
+                time.sleep(0.01)
+            else:
+                self.step()
+
+    def run_recording(self, max_ticks, exporter):
+        """Run headless for max_ticks, rendering and exporting a frame every exporter.every ticks."""
+        self.viz.precompute_environment()
+        self.viz.handle_zoom(self.viz.zoom_factor)
+        self.paused = False
+        try:
+            while self.running and self.ticks < max_ticks:
+                self.process_commands()
+                self.step()
+                self.viz.update_population_history()
+                if exporter.wants(self.ticks):
+                    organisms_count = len(self.env.organisms)
+                    avg_speed = sum(
+                        organism.speed for organism in self.env.organisms) / organisms_count if organisms_count else 0
+                    avg_size = sum(
+                        organism.size for organism in self.env.organisms) / organisms_count if organisms_count else 0
+                    self.draw_frame(organisms_count, avg_speed, avg_size)
+                    exporter.capture(self.viz.screen, self.ticks)
+        finally:
+            exporter.close()
+
+    def enable_scheduled_death(self):
+        """Schedule natural deaths at birth, removing the per-tick hazard roll from the organism update."""
+        self.env.current_tick = self.ticks
+        if self.aggregation is not None:
+            raise ValueError('Scheduled death cannot be combined with aggregation')
+        self.env.enable_scheduled_death()
+
+    def enable_batched_births(self):
+        """Queue births during the tick and create all children with one batched mutation."""
+        self.genome_factory = GenomeFactory(self.env.rng)
+        self.env.birth_queue = []
+
+    def enable_sexual_reproduction(self, radius=30):
+        """Fertile organisms reproduce in pairs, with a mate of the same diet within radius.
+
+        Every tick the fertile organisms are matched in one pass (see match_mates). Each pair has two
+        children by crossover plus mutation, one next to each parent. Organisms left without a mate
+        stay fertile and try again on the next tick. Groups of the aggregation mode still reproduce
+        on their own.
+        """
+        self.env.mating_queue = []
+        self.mate_radius = radius
+
+    def match_mates(self):
+        """Pair the organisms that became fertile with their nearest free mate and create the children.
+
+        Candidate pairs come from a grid over the fertile organisms only, and are matched greedily,
+        closest pairs first.
+        """
+        fertile = [organism for organism in dict.fromkeys(self.env.mating_queue) if organism.is_alive()]
+        self.env.mating_queue = []
+        if len(fertile) < 2:
+            return
+        radius = self.mate_radius
+        grid = SpatialGrid(radius)
+        grid.update(fertile)
+        indices = {organism: index for index, organism in enumerate(fertile)}
+        candidates = []
+        for index, organism in enumerate(fertile):
+            for mate in grid.near(organism.x, organism.y, radius):
+                if mate is organism:
+                    continue
+                mate_index = indices[mate]
+                if mate_index > index and mate.food_types == organism.food_types:
+                    distance = math.hypot(mate.x - organism.x, mate.y - organism.y)
+                    if distance <= radius:
+                        candidates.append((distance, index, mate_index))
+        candidates.sort()
+        paired = set()
+        pairs = []
+        for _, index, mate_index in candidates:
+            if index not in paired and mate_index not in paired:
+                paired.update((index, mate_index))
+                pairs.append((fertile[index], fertile[mate_index]))
+        if not pairs:
+            return
+
+        if self.genome_factory is not None:
+            # Cross over and mutate all pairs' genomes in batches
+            first_children, second_children = self.genome_factory.crossover(
+                GenomeBatch.from_dnas([first.dna for first, _ in pairs]),
+                GenomeBatch.from_dnas([second.dna for _, second in pairs]))
+            first_children = self.genome_factory.mutate(first_children)
+            second_children = self.genome_factory.mutate(second_children)
+            children = [(first_children.dna(index), second_children.dna(index)) for index in range(len(pairs))]
+        else:
+            children = []
+            for first, second in pairs:
+                first_dna, second_dna = first.dna.crossover(second.dna)
+                children.append((first_dna.mutate(), second_dna.mutate()))
+
+        for parents, child_dnas in zip(pairs, children):
+            for parent, child_dna in zip(parents, child_dnas):
+                parent.fertile_development -= 30
+                self.env.add_organism(Organism(child_dna, parent.x + random.uniform(-5, 5),
+                                               parent.y + random.uniform(-5, 5), 30, self.env))
+
+    def enable_activity_scheduling(self, max_skip=10):
+        """Skip sensing for organisms far from any food or prey, see proceed_organisms_by_activity."""
+        self.max_skip = max_skip
+
+    def enable_aggregation(self, interval=10, radius=20, age_tolerance=30, max_group=1000):
+        """Represent nearby organisms with the same genome and similar age as one group carrying a count.
+
+        Every `interval` ticks organisms are merged into groups (see Environment.aggregate_organisms).
+        The default age tolerance covers one reproduction interval, so siblings can merge. Children the
+        mutation left unchanged join their parent's group at birth, so clans stay one agent as they grow.
+        A group senses, moves, eats, reproduces and dies as a whole, trading individual resolution
+        for a much larger population at the same tick cost. Not combined with scheduled death, which
+        would kill whole groups at once.
+        """
+        if self.env.death_schedule is not None:
+            raise ValueError('Aggregation cannot be combined with scheduled death')
+        self.aggregation = (interval, radius, age_tolerance, max_group)
+        self.env.merge_births = True
+
+    def flush_births(self):
+        births = self.env.birth_queue
+        if not births:
+            return
+        self.env.birth_queue = []
+        children = self.genome_factory.mutate(GenomeBatch.from_dnas([parent.dna for parent, _, _ in births]))
+        mutated = children.mutated.tolist()
+        for index, (parent, child_x, child_y) in enumerate(births):
+            if not mutated[index] and self.env.merge_births and parent.alive:
+                parent.add_newborns(1)
+                continue
+            # Unmutated children share their parent's immutable genome and decoded traits
+            child_dna = children.dna(index) if mutated[index] else parent.dna
+            self.env.add_organism(Organism(child_dna, child_x, child_y, 30, self.env))
+
+    def draw_organisms(self):
+        if self.viz.density_view:
+            self.viz.draw_density(self.env.organisms)
+        else:
+            self.viz.draw_organisms(self.env.organisms)
 
     def process_events(self):
         for event in pygame.event.get():
+            self.frame_pending = True
             if event.type == pygame.QUIT:
                 self.running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    self.paused = not self.paused  # Toggle the paused state when spacebar is pressed
-                    if self.paused:
-                        self.viz.start_pause_button.set_text('Start')
-                    else:
-                        self.viz.start_pause_button.set_text('Pause')
+                    self.set_paused(not self.paused)  # Toggle the paused state when spacebar is pressed
                 elif event.key == pygame.K_PLUS or event.key == pygame.K_EQUALS:
                     self.viz.zoom_in()
                 elif event.key == pygame.K_MINUS:
                     self.viz.zoom_out()
                 elif event.key == pygame.K_g:
                     self.overlay_is_on = not self.overlay_is_on
+                    if self.overlay_is_on:
+                        self.viz.refresh_overlays()  # The cached graphs were not refreshed while hidden
+                    self.viz.invalidate()
                 elif event.key == pygame.K_c:
                     self.controls_are_on = not self.controls_are_on
+                    if self.controls_are_on:
+                        self.viz.ui_scheduler.refresh_soon('labels')
+                    self.viz.invalidate()
+                elif event.key == pygame.K_d:
+                    self.viz.dirty_rendering = not self.viz.dirty_rendering
+                    self.viz.invalidate()
             self.viz.manager.process_events(event)
 
             # Handle Start Button Click
             if event.type == pygame_gui.UI_BUTTON_PRESSED:
                 if event.ui_element == self.viz.start_pause_button:
-                    self.paused = not self.paused
-                    if self.paused:
-                        self.viz.start_pause_button.set_text('Start')
-                    else:
-                        self.viz.start_pause_button.set_text('Pause')
+                    self.set_paused(not self.paused)
                 # if event.ui_element == self.viz.food_slider:
                 #     food_amount = int(self.viz.food_slider.get_current_value())
                 #     self.viz.food_slider_label.set_text(f"Food Amount: {food_amount}")
+            if event.type == pygame_gui.UI_SELECTION_LIST_NEW_SELECTION:
+                if event.ui_element == self.viz.predators_checkbox:
+                    self.viz.set_display_mode(event.text)
             if event.type == pygame_gui.UI_HORIZONTAL_SLIDER_MOVED:
                 if event.ui_element == self.viz.food_slider:
-                    food_amount = int(self.viz.food_slider.get_current_value())
-                    self.viz.food_slider_label.set_text(f"Food Amount: {food_amount}")
+                    self.food_amount = int(self.viz.food_slider.get_current_value())
+                    self.viz.food_slider_label.set_text(f"Food Amount: {self.food_amount}")
                 if event.ui_element == self.viz.tick_skip_slider:
                     self.skip_ticks = int(self.viz.tick_skip_slider.get_current_value())
                     self.viz.tick_skip_label.set_text(f"Ticks to skip: {self.skip_ticks}")
@@ -98,6 +418,26 @@ class Simulation:
         if keys[pygame.K_DOWN]:
             self.viz.pan_camera(0, 10)
 
+    def draw_frame(self, organisms_count, avg_speed, avg_size):
+        self.viz.update_level_of_detail()
+        if self.viz.dirty_rendering:
+            # Overlays and panels are redrawn every frame, so their regions are always restored first
+            if self.overlay_is_on:
+                for rect in self.viz.overlay_rects():
+                    self.viz.mark_dirty(rect)
+            if self.controls_are_on:
+                for rect in self.viz.ui_rects():
+                    self.viz.mark_dirty(rect)
+        self.viz.draw_environment()  # Draw the precomputed environment
+        self.draw_organisms()
+        if self.overlay_is_on:
+            self.overlay_draw(organisms_count)
+        if self.controls_are_on:
+            self.viz.draw_ui(self.ticks, organisms_count, avg_speed, avg_size)
+
+        self.viz.present()  # Update the display
+        self.frame_pending = False
+
     def run(self):
         """Run the visualization loop."""
 
@@ -117,29 +457,27 @@ class Simulation:
 
         while self.running:
             self.process_events()
+            self.process_commands()
             self.viz.manager.update(time_delta)
             self.process_keys()
-            if not self.paused:
-                self.ticks += 1
-                generation += 1
-                # Add food every 5 ticks
-                if self.ticks % 5 == 0:
-                    for i in range(int(self.viz.food_slider.get_current_value())):
-                        self.env.add_food()
-                self.proceed_organisms()
-                organisms_count = len(self.env.organisms)
+            # Fast-forward runs a chunk of ticks per frame on top of the regular tick
+            fast_forward = min(self.fast_forward_ticks, 100)
+            self.fast_forward_ticks -= fast_forward
+            ticks_to_run = fast_forward if self.paused else fast_forward + 1
+            for _ in range(ticks_to_run):
+                self.step()
                 self.viz.update_population_history()
+            if ticks_to_run:
+                generation += ticks_to_run
+                self.frame_pending = True
+                organisms_count = len(self.env.organisms)
                 if self.overlay_is_on:
                     avg_speed = sum(
                         organism.speed for organism in self.env.organisms) / organisms_count if organisms_count else 0
                     avg_size = sum(
                         organism.size for organism in self.env.organisms) / organisms_count if organisms_count else 0
             if self.ticks % self.skip_ticks == 0:
-                self.viz.draw_environment()  # Draw the precomputed environment
-                self.draw_organisms()
-                if self.overlay_is_on:
-                    self.overlay_draw(organisms_count)
-                if self.controls_are_on:
-                    self.viz.draw_ui(self.ticks, organisms_count, avg_speed, avg_size)
-
-                pygame.display.flip()  # Update the display
+                if self.viz.dirty_rendering and not (self.frame_pending or self.viz.full_redraw):
+                    self.clock.tick(self.idle_fps)  # Nothing changed: skip the frame and yield the CPU
+                else:
+                    self.draw_frame(organisms_count, avg_speed, avg_size)
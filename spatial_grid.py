@@ -0,0 +1,52 @@
+class SpatialGrid:
+    """Buckets objects with x and y attributes into square cells for neighbourhood queries.
+
+    update() re-buckets only the objects that changed cell since the previous call, so keeping the
+    grid current costs one dict lookup per object, and a query only visits the cells around it.
+    Buckets are insertion-ordered dicts, so iteration order does not depend on object addresses.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> {object: None}
+        self.object_cells = {}  # object -> (column, row)
+
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def update(self, objects):
+        """Track the given objects at their current positions and forget all others."""
+        cells = self.cells
+        previous = self.object_cells
+        current = {}
+        for item in objects:
+            cell = (int(item.x // self.cell_size), int(item.y // self.cell_size))
+            old_cell = previous.pop(item, None)
+            if old_cell != cell:
+                if old_cell is not None:
+                    self.discard(item, old_cell)
+                cells.setdefault(cell, {})[item] = None
+            current[item] = cell
+        for item, old_cell in previous.items():  # Objects no longer present
+            self.discard(item, old_cell)
+        self.object_cells = current
+
+    def discard(self, item, cell):
+        bucket = self.cells[cell]
+        del bucket[item]
+        if not bucket:
+            del self.cells[cell]
+
+    def near(self, x, y, radius):
+        """Yield the objects in the cells overlapping the square of the given radius around (x, y).
+
+        Candidates may lie up to a cell outside the radius; callers check the exact distance.
+        """
+        column0, row0 = self.cell_of(x - radius, y - radius)
+        column1, row1 = self.cell_of(x + radius, y + radius)
+        cells = self.cells
+        for column in range(column0, column1 + 1):
+            for row in range(row0, row1 + 1):
+                bucket = cells.get((column, row))
+                if bucket:
+                    yield from bucket
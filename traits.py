@@ -1,3 +1,6 @@
+from types import MappingProxyType
+
+
 class Traits:
     def __init__(self, dna):
         self.dna = dna
@@ -5,22 +8,28 @@ class Traits:
 
     @staticmethod
     def decode_dna(dna):
+        """Decode DNA into traits, memoized on the (immutable) DNA object."""
+        if dna.decoded_traits is not None:
+            return dna.decoded_traits
         traits = {}
-        genes = dna.genes
+        metabolism_rate = dna.get_gene('metabolism_rate')
+        food_types = dna.get_gene('food_types')
+        food_sense_distance = dna.get_gene('food_sense_distance')
+        if food_sense_distance is None:
+            food_sense_distance = 50.0
 
         # Decode each gene type
-        traits['size'] = genes.get('initial_size', 3.0)
+        traits['size'] = dna.get_gene('initial_size') or 3.0
 
         # calculated traits
-        traits['speed'] = genes.get('metabolism_rate') / traits['size'] * 50
-        traits['food_sense_distance'] = genes.get('food_sense_distance', 50.0) if genes.get('food_types') == 'plant' \
-            else genes.get('food_sense_distance', 50.0) * 1.2
-        traits['skin_color'] = 'blue' if genes.get('food_types') == 'plant' else 'red'
-        traits['reproduction_rate'] = genes.get('metabolism_rate') * 5 if genes.get('food_types') == 'plant' \
-            else genes.get('metabolism_rate') * 2
-        traits['max_energy'] = genes.get('metabolism_rate') * 1000
+        traits['speed'] = metabolism_rate / traits['size'] * 50
+        traits['food_sense_distance'] = food_sense_distance if food_types == 'plant' else food_sense_distance * 1.2
+        traits['skin_color'] = 'blue' if food_types == 'plant' else 'red'
+        traits['reproduction_rate'] = metabolism_rate * 5 if food_types == 'plant' else metabolism_rate * 2
+        traits['max_energy'] = metabolism_rate * 1000
 
-        return traits
+        dna.decoded_traits = MappingProxyType(traits)
+        return dna.decoded_traits
 
     @staticmethod
     def calculate_speed(dna, organism):
@@ -35,3 +44,10 @@ class Traits:
                 return dna.get_gene('initial_size') * 1.4 / (organism.max_age - organism.age) * (organism.max_age / 2)
         else:
             return organism.size
+
+    @staticmethod
+    def growth_coefficient(dna):
+        """Return the constant c of the growth curve size(age) = c / (max_age - age) used by calculate_size."""
+        factor = 1.8 if dna.get_gene('food_types') == 'prey' else 1.4
+        max_age = dna.get_gene('max_age')
+        return dna.get_gene('initial_size') * factor * (max_age / 2)
@@ -0,0 +1,45 @@
+import time
+
+
+class RefreshScheduler:
+    """Decides which HUD widgets and overlays are refreshed on a frame.
+
+    Every widget has its own refresh interval in seconds and keeps showing its last rendering in
+    between. Cheap widgets refresh as soon as they are due. Time-sliced widgets are expensive, so at
+    most `slices_per_frame` of them refresh on one frame, the most overdue first, and the others wait
+    for the following frames.
+    """
+
+    def __init__(self, slices_per_frame=1, clock=time.perf_counter):
+        self.slices_per_frame = slices_per_frame
+        self.clock = clock
+        self.widgets = {}  # name -> [interval, refresh callback, time sliced, due time]
+
+    def add(self, name, interval, refresh, time_sliced=False):
+        self.widgets[name] = [interval, refresh, time_sliced, 0.0]
+
+    def refresh_soon(self, name):
+        """Make a widget due on the next run, e.g. after the data it shows was reset."""
+        self.widgets[name][3] = 0.0
+
+    def run(self, names, now=None):
+        """Refresh the due widgets among `names` and return the names that were refreshed."""
+        now = self.clock() if now is None else now
+        refreshed = []
+        overdue = []
+        for name in names:
+            widget = self.widgets[name]
+            if now < widget[3]:
+                continue
+            if widget[2]:
+                overdue.append((widget[3], name))
+            else:
+                refreshed.append(name)
+        overdue.sort()
+        refreshed += [name for _, name in overdue[:self.slices_per_frame]]
+
+        for name in refreshed:
+            widget = self.widgets[name]
+            widget[1]()
+            widget[3] = now + widget[0]
+        return refreshed
@@ -1,9 +1,18 @@
+import math
+import os
 import pygame
+import numpy as np
 import pygame_gui
+from background_tiles import BackgroundTiles, environment_colors
+from ui_scheduler import RefreshScheduler
 
 
 class Visualizer:
-    def __init__(self, environment, screen_width, screen_height):
+    def __init__(self, environment, screen_width, screen_height, dirty_rendering=False, tiled_background=None,
+                 offscreen=False):
+        if offscreen:
+            # Render without a display, e.g. for exporting frames on a server
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
         pygame.init()
         pygame.display.set_caption('Evolution Simulator')
         self.screen_width = screen_width
@@ -102,25 +111,120 @@ class Visualizer:
         #     container=self.display_panel)
 
         self.env = environment
-        """Precompute the environment drawing and store it as a surface."""
-        self.env_surface = pygame.Surface((self.env.width, self.env.height))
+        # Large worlds get a lazily rendered, tiled background instead of one world-sized surface
+        if tiled_background is None:
+            tiled_background = self.env.width * self.env.height > 4000 * 4000
+        self.pan_direction = (0, 0)
+        if tiled_background:
+            self.env_surface = None
+            self.background_tiles = BackgroundTiles(self.env)
+            self.background_tiles.set_zoom(self.zoom_factor)
+        else:
+            """Precompute the environment drawing and store it as a surface."""
+            self.env_surface = pygame.Surface((self.env.width, self.env.height))
+            self.background_tiles = None
 
         self.organisms = environment.get_organisms()  # List to hold organisms for visualization
 
+        # Food is stamped into a persistent layer at the current zoom and only patched when it changes
+        self.food_layer = None
+        self.food_radius = 3  # Food radius in world units
+        self.food_cell_size = 8  # Bucket size for finding overlapping food when erasing
+        self.food_cells = {}
+        self.env.track_food_changes = not tiled_background  # The tiled view draws visible food directly
+
         self.font = pygame.font.SysFont(None, 24)
-        self.graph_surface = pygame.Surface((self.screen_width, 200), pygame.SRCALPHA)  # Transparent surface for graphs
+        self.graph_font = pygame.font.SysFont(None, 16)
+        # Transparent surfaces for graphs, one per graph so each keeps its last rendering
+        self.graph_surfaces = {name: pygame.Surface((self.screen_width, 200), pygame.SRCALPHA)
+                               for name in ('metabolism', 'food_sense', 'activeness')}
         self.pop_graph_surface = pygame.Surface((self.screen_width - 10, 100),
                                                 pygame.SRCALPHA)  # Transparent surface for population graph
+        self.graph_titles = {name: pygame.transform.rotate(self.font.render(title, True, (255, 255, 255)), 90)
+                             for name, title in (('metabolism', 'Metabolism'), ('food_sense', 'Sense Distance'),
+                                                 ('activeness', 'Activeness'), ('population', 'Population'))}
         self.population_history = []
 
+        # Labels and overlay graphs are refreshed at their own rates and redrawn from cache in between
+        self.ui_scheduler = RefreshScheduler(slices_per_frame=1)
+        self.ui_scheduler.add('labels', 0.2, self.refresh_labels)
+        self.ui_scheduler.add('population', 0.5, self.render_population_graph, time_sliced=True)
+        self.ui_scheduler.add('metabolism', 1.0, self.render_metabolism_graph, time_sliced=True)
+        self.ui_scheduler.add('food_sense', 1.0, self.render_food_sense_graph, time_sliced=True)
+        self.ui_scheduler.add('activeness', 1.0, self.render_activeness_graph, time_sliced=True)
+        self.overlay_names = ('metabolism', 'food_sense', 'population', 'activeness')
+        self.overlay_blits = {}  # Overlay name -> cached (surface, position) pairs
+        self.label_values = None
+
+        # Organism sprites are pre-rendered once per (color, radius, zoom) and blitted in one batch
+        self.sprite_cache = {}
+        self.natural_palette = {name: tuple(pygame.Color(name))[:3] for name in ('blue', 'red')}
+        self.predator_palette = {'prey': (255, 60, 60), 'plant': (110, 110, 110)}
+        self.energy_palette_max = 100  # Energy mapped to the brightest palette entry
+        self.energy_palette = [
+            (int(255 * min(1, 2 * (1 - i / 15))), int(255 * min(1, 2 * i / 15)), 0) for i in range(16)
+        ]
+        self.energy_palette_scale = (len(self.energy_palette) - 1) / self.energy_palette_max
+        self.display_mode = 'Natural'
+        self.organism_color = self.natural_color
+
+        # Dirty-rectangle rendering: only changed screen regions are restored and pushed to the display
+        self.dirty_rendering = dirty_rendering
+        self.full_redraw = True
+        self.dirty_rects = []  # Regions to restore and push on the next frame
+        self.organism_rects = []  # Screen regions covered by organisms on the last frame
+        self.update_rects = []  # Regions pushed to the display by present()
+
+        # Level of detail: when zoomed out over a crowded world, draw density heatmaps instead of circles
+        self.lod_threshold = 5000  # Organisms plus food items above which the density view is used
+        self.lod_max_zoom = 0.75
+        self.lod_bin_size = 3  # Screen pixels per heatmap bin
+        self.density_view = False
+        self.food_density = None  # (food version, camera, zoom, histogram) of the last food histogram
+
+    def natural_color(self, organism):
+        return self.natural_palette[organism.color]
+
+    def predator_color(self, organism):
+        return self.predator_palette[organism.food_types]
+
+    def energy_color(self, organism):
+        index = int(organism.energy * self.energy_palette_scale)
+        return self.energy_palette[min(max(index, 0), len(self.energy_palette) - 1)]
+
+    def set_display_mode(self, mode):
+        """Switch the organism coloring between the 'Natural', 'Predators' and 'Energy' palettes."""
+        color_lookups = {
+            'Natural': self.natural_color,
+            'Predators': self.predator_color,
+            'Energy': self.energy_color,
+        }
+        if mode in color_lookups:
+            self.display_mode = mode
+            self.organism_color = color_lookups[mode]
+
+    def get_sprite(self, color, radius):
+        """Return a cached circle sprite of the given color and on-screen radius."""
+        key = (color, radius, self.zoom_factor)
+        sprite = self.sprite_cache.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, color, (radius, radius), radius)
+            self.sprite_cache[key] = sprite
+        return sprite
+
     def pan_camera(self, dx, dy):
         # Calculate the maximum pan limits
         max_pan_x = max(0, self.env.width * self.zoom_factor - self.screen_width)
         max_pan_y = max(0, self.env.height * self.zoom_factor - self.screen_height)
 
         # Update the camera position, respecting the pan limits
+        previous_camera = (self.camera_x, self.camera_y)
         self.camera_x = min(max(self.camera_x + dx, 0), max_pan_x)
         self.camera_y = min(max(self.camera_y + dy, 0), max_pan_y)
+        if (self.camera_x, self.camera_y) != previous_camera:
+            self.pan_direction = (dx, dy)
+            self.invalidate()
 
     def zoom_in(self):
         self.handle_zoom(self.zoom_factor * 1.1)
@@ -141,6 +245,10 @@ class Visualizer:
 
         # Limit zoom-out and zoom-in factors
         self.zoom_factor = min(max(self.zoom_factor, 0.5), 1.7)  # Min zoom 50%, max zoom 200%
+        if self.zoom_factor != previous_zoom_factor:
+            self.sprite_cache.clear()  # Sprites of the previous zoom level are no longer used
+            self.food_layer = None  # Rebuilt at the new zoom level on the next draw
+            self.invalidate()
 
         # Adjust camera position to ensure it stays within bounds
         self.camera_x = min(max(self.camera_x * (self.zoom_factor / previous_zoom_factor), 0),
@@ -148,6 +256,10 @@ class Visualizer:
         self.camera_y = min(max(self.camera_y * (self.zoom_factor / previous_zoom_factor), 0),
                             max(0, self.env.height * self.zoom_factor - self.screen_height))
 
+        if self.background_tiles is not None:
+            self.background_tiles.set_zoom(self.zoom_factor)
+            return
+
         # Scale the environment surface only when zoom changes
         self.env_surface = pygame.transform.scale(
             self.env_surface,
@@ -155,62 +267,27 @@ class Visualizer:
         )
 
     def update_labels(self, ticks, organism_count, avg_speed, avg_size):
-        # Update label texts based on current state
+        # Keep the latest values; the labels pick them up at their own refresh rate
+        self.label_values = (ticks, organism_count, avg_speed, avg_size)
+        self.ui_scheduler.run(('labels',))
+
+    def refresh_labels(self):
+        # Update label texts based on current state; set_text only re-lays out labels whose text changed
+        ticks, organism_count, avg_speed, avg_size = self.label_values
         self.tick_label.set_text(f"Ticks: {ticks}")
         self.organism_label.set_text(f"Organisms: {organism_count}")
         self.avg_speed_label.set_text(f"Average speed: {avg_speed:.2f}")
         self.avg_size_label.set_text(f"Average size: {avg_size:.2f}")
 
     def precompute_environment(self):
-        # Define the temperature border values
-        temp_border1 = self.env.temperature_border1
-        temp_border2 = self.env.temperature_border2
-
-        # Define the gradient width
-        gradient_width = 10  # Width of the gradient transition zone
-
-        for y in range(self.env.height):
-            for x in range(self.env.width):
-                light_level = self.env.get_light_level(x, y)
-                temperature = self.env.get_temperature(x, y)
-
-                # Define color boundaries
-                cold_color = (0, 0, 255)  # Color for colder temperatures
-                hot_color = (255, 0, 0)  # Color for hotter temperatures
-
-                # Calculate temperature influence and gradient
-                if temperature < temp_border2:
-                    color = cold_color
-                elif temperature > temp_border1:
-                    color = hot_color
-                else:
-                    # Calculate distance from the nearest border
-                    dist_to_border1 = abs(temperature - temp_border1)
-                    dist_to_border2 = abs(temperature - temp_border2)
-
-                    # Determine the gradient zone and calculate influence
-                    if dist_to_border1 < gradient_width:
-                        gradient_influence = 1 - (dist_to_border1 / gradient_width)
-                    elif dist_to_border2 < gradient_width:
-                        gradient_influence = 1 - (dist_to_border2 / gradient_width)
-                    else:
-                        gradient_influence = 0
-
-                    # Interpolate between cold_color and hot_color based on gradient influence
-                    color = (
-                        int((1 - gradient_influence) * cold_color[0] + gradient_influence * hot_color[0]),
-                        int((1 - gradient_influence) * cold_color[1] + gradient_influence * hot_color[1]),
-                        int((1 - gradient_influence) * cold_color[2] + gradient_influence * hot_color[2])
-                    )
-
-                # Apply light level to the color
-                color = (
-                    int(light_level * color[0]),
-                    int(light_level * color[1]),
-                    int(light_level * color[2])
-                )
-
-                self.env_surface.set_at((x, y), color)
+        if self.background_tiles is not None:
+            return  # Tiles are rendered on demand as they enter the view
+
+        # Color every pixel in one vectorized pass; surfarray is indexed [x, y]
+        width, height = self.env.width, self.env.height
+        xs = np.broadcast_to(np.arange(width)[:, np.newaxis], (width, height))
+        ys = np.broadcast_to(np.arange(height)[np.newaxis, :], (width, height))
+        pygame.surfarray.blit_array(self.env_surface, environment_colors(self.env, xs, ys))
 
     def draw_text(self, text, position):
         """Render text on the screen."""
@@ -227,33 +304,252 @@ class Visualizer:
         #                                              int(self.env.height * self.zoom_factor)))
 
         """Blit the precomputed environment surface to the screen."""
-        self.screen.blit(self.env_surface, (-self.camera_x, -self.camera_y))
-
-        # Draw food
+        if self.background_tiles is not None:
+            self.draw_tiled_environment()
+            return
+
+        # Bring the food layer up to date, aligned with the organism coordinate mapping
+        if self.food_layer is None:
+            self.rebuild_food_layer()
+            self.invalidate()
+        else:
+            self.update_food_layer()
+
+        if self.env.food_field is not None:
+            self.invalidate()  # The food field changes everywhere on every tick
+
+        if self.dirty_rendering and not self.full_redraw:
+            # Restore only the regions that changed since the last frame
+            self.update_rects = self.organism_rects + self.dirty_rects
+            for rect in self.update_rects:
+                self.restore_background(rect)
+        else:
+            self.screen.blit(self.env_surface, (-int(self.camera_x), -int(self.camera_y)))
+            food_offset_x, food_offset_y = self.food_layer_offset()
+            if not self.density_view:
+                self.screen.blit(self.food_layer, (-food_offset_x, -food_offset_y))
+            if self.env.food_field is not None:
+                self.draw_food_field()
+        self.dirty_rects = []
+
+    def draw_food_field(self):
+        """Draw the visible part of the raster food field as a scaled green alpha map."""
+        field = self.env.food_field
+        column0 = max(int(self.camera_x // field.cell_size), 0)
+        row0 = max(int(self.camera_y // field.cell_size), 0)
+        column1 = min(math.ceil((self.camera_x + self.screen_width / self.zoom_factor) / field.cell_size), field.columns)
+        row1 = min(math.ceil((self.camera_y + self.screen_height / self.zoom_factor) / field.cell_size), field.rows)
+        if column1 <= column0 or row1 <= row0:
+            return
+
+        visible = field.energy[row0:row1, column0:column1]
+        field_surface = pygame.Surface((column1 - column0, row1 - row0), pygame.SRCALPHA)
+        field_surface.fill((0, 255, 0, 0))
+        alpha = pygame.surfarray.pixels_alpha(field_surface)
+        alpha[:] = (visible.T * (180 / field.max_energy)).astype('uint8')
+        del alpha  # Release the surface lock
+
+        cell_pixels = field.cell_size * self.zoom_factor
+        field_surface = pygame.transform.scale(
+            field_surface, (int((column1 - column0) * cell_pixels), int((row1 - row0) * cell_pixels)))
+        self.screen.blit(field_surface, (int((column0 * field.cell_size - self.camera_x) * self.zoom_factor),
+                                         int((row0 * field.cell_size - self.camera_y) * self.zoom_factor)))
+
+    def draw_tiled_environment(self):
+        """Draw the visible background tiles and food, then prefetch tiles in the pan direction."""
+        self.invalidate()  # Without a world-sized food layer, frames are always redrawn in full
+        self.dirty_rects = []
+        self.background_tiles.draw(self.screen, self.camera_x, self.camera_y)
+        if not self.density_view:
+            self.draw_visible_food()
+        if self.env.food_field is not None:
+            self.draw_food_field()
+        self.background_tiles.prefetch(self.screen.get_rect(), self.camera_x, self.camera_y, self.pan_direction)
+        self.pan_direction = (0, 0)
+
+    def draw_visible_food(self):
+        radius = int(self.food_radius * self.zoom_factor)
         for food_position in self.env.get_food_positions():
             screen_x = (food_position[0] - self.camera_x) * self.zoom_factor
             screen_y = (food_position[1] - self.camera_y) * self.zoom_factor
             # Draw food if within the current view
             if 0 <= screen_x <= self.screen_width and 0 <= screen_y <= self.screen_height:
-                pygame.draw.circle(self.screen, (0, 255, 0), (int(screen_x), int(screen_y)), int(3 * self.zoom_factor))
+                pygame.draw.circle(self.screen, (0, 255, 0), (int(screen_x), int(screen_y)), radius)
+
+    def food_layer_offset(self):
+        return int(self.camera_x * self.zoom_factor), int(self.camera_y * self.zoom_factor)
+
+    def restore_background(self, rect):
+        """Redraw the background and food layer inside a screen rectangle."""
+        self.screen.blit(self.env_surface, rect, area=rect.move(int(self.camera_x), int(self.camera_y)))
+        self.screen.blit(self.food_layer, rect, area=rect.move(*self.food_layer_offset()))
+
+    def invalidate(self):
+        """Request a full redraw and display flip on the next frame."""
+        self.full_redraw = True
+
+    def mark_dirty(self, rect):
+        """Mark a screen rectangle to be restored and pushed on the next frame."""
+        self.dirty_rects.append(pygame.Rect(rect))
+
+    def overlay_rects(self):
+        """Screen regions covered by the overlay graphs."""
+        return [pygame.Rect(0, 0, self.screen_width, self.graph_surfaces['metabolism'].get_height() + 10),
+                pygame.Rect(0, self.screen_height - 110, self.screen_width, 110)]
+
+    def ui_rects(self):
+        """Screen regions covered by the control panels."""
+        return [self.info_panel.get_abs_rect(), self.control_panel.get_abs_rect(), self.display_panel.get_abs_rect()]
+
+    def present(self):
+        """Push the frame to the display, either whole or as the changed regions only."""
+        if self.dirty_rendering and not self.full_redraw:
+            pygame.display.update(self.update_rects + self.organism_rects)
+        else:
+            pygame.display.flip()
+        self.full_redraw = False
+        self.update_rects = []
+
+    def rebuild_food_layer(self):
+        """Stamp all food into a fresh transparent layer at the current zoom level."""
+        self.food_layer = pygame.Surface((int(self.env.width * self.zoom_factor),
+                                          int(self.env.height * self.zoom_factor)), pygame.SRCALPHA)
+        self.env.drain_food_changes()
+        self.food_cells = {}
+        for food_position in self.env.get_food_positions():
+            self.food_cells.setdefault(self.food_cell(food_position), []).append(food_position)
+            self.stamp_food(food_position)
+
+    def update_food_layer(self):
+        """Apply food additions and removals since the last frame to the food layer."""
+        for food_position, added in self.env.drain_food_changes():
+            cell = self.food_cell(food_position)
+            if added:
+                self.food_cells.setdefault(cell, []).append(food_position)
+                self.stamp_food(food_position)
+                if self.dirty_rendering:
+                    self.mark_food_dirty(food_position)
+                continue
+
+            bucket = self.food_cells.get(cell)
+            if bucket and food_position in bucket:
+                bucket.remove(food_position)
+            self.stamp_food(food_position, (0, 0, 0, 0))
+            if self.dirty_rendering:
+                self.mark_food_dirty(food_position)
+            # Erasing may have cut into overlapping neighbours, so stamp them again
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for neighbour in self.food_cells.get((cell[0] + dx, cell[1] + dy), ()):
+                        self.stamp_food(neighbour)
+
+    def mark_food_dirty(self, food_position):
+        food_offset_x, food_offset_y = self.food_layer_offset()
+        radius = int(self.food_radius * self.zoom_factor) + 1
+        self.mark_dirty((int(food_position[0] * self.zoom_factor) - food_offset_x - radius,
+                         int(food_position[1] * self.zoom_factor) - food_offset_y - radius,
+                         radius * 2 + 1, radius * 2 + 1))
+
+    def food_cell(self, food_position):
+        return int(food_position[0] // self.food_cell_size), int(food_position[1] // self.food_cell_size)
+
+    def stamp_food(self, food_position, color=(0, 255, 0)):
+        pygame.draw.circle(self.food_layer, color,
+                           (int(food_position[0] * self.zoom_factor), int(food_position[1] * self.zoom_factor)),
+                           int(self.food_radius * self.zoom_factor))
 
     def draw_organism(self, organism):
         """Draw an organism on the screen using its size and color."""
-        color = pygame.Color(organism.color)  # Convert organism color to pygame.Color
-        screen_x = (organism.x - self.camera_x) * self.zoom_factor
-        screen_y = (organism.y - self.camera_y) * self.zoom_factor
-
-        # Draw organism if within the current view
-        if 0 <= screen_x <= self.screen_width and 0 <= screen_y <= self.screen_height:
-            pygame.draw.circle(self.screen, organism.color, (int(screen_x), int(screen_y)),
-                               int(organism.size * self.zoom_factor))
+        self.draw_organisms((organism,))
+
+    def draw_organisms(self, organisms):
+        """Draw all visible organisms with a single batched blit of cached sprites."""
+        zoom = self.zoom_factor
+        camera_x = self.camera_x
+        camera_y = self.camera_y
+        organism_color = self.organism_color
+        get_sprite = self.get_sprite
+        blit_sequence = []
+        for organism in organisms:
+            screen_x = (organism.x - camera_x) * zoom
+            screen_y = (organism.y - camera_y) * zoom
+
+            # Draw organism if within the current view
+            if 0 <= screen_x <= self.screen_width and 0 <= screen_y <= self.screen_height:
+                radius = int(organism.size * zoom)
+                if radius < 1:
+                    continue
+                sprite = get_sprite(organism_color(organism), radius)
+                blit_sequence.append((sprite, (int(screen_x) - radius, int(screen_y) - radius)))
+        rects = self.screen.blits(blit_sequence, doreturn=self.dirty_rendering)
+        self.organism_rects = rects if self.dirty_rendering else []
+
+    def update_level_of_detail(self):
+        """Choose between drawing individual organisms and the density view for the next frame."""
+        crowded = len(self.organisms) + len(self.env.get_food_positions()) > self.lod_threshold
+        density_view = crowded and self.zoom_factor <= self.lod_max_zoom
+        if density_view or density_view != self.density_view:
+            self.invalidate()  # The heatmap covers the whole view
+        self.density_view = density_view
+
+    def density_histogram(self, xs, ys):
+        """Bin world coordinates into a screen-aligned 2D histogram, indexed [x, y]."""
+        bins = (self.screen_width // self.lod_bin_size, self.screen_height // self.lod_bin_size)
+        screen_xs = (xs - self.camera_x) * self.zoom_factor
+        screen_ys = (ys - self.camera_y) * self.zoom_factor
+        histogram, _, _ = np.histogram2d(screen_xs, screen_ys, bins=bins,
+                                         range=((0, bins[0] * self.lod_bin_size), (0, bins[1] * self.lod_bin_size)))
+        return histogram
+
+    @staticmethod
+    def density_intensity(histogram):
+        """Map bin counts to 0-255 on a log scale, so sparse and dense regions both stay visible."""
+        peak = histogram.max()
+        if peak <= 0:
+            return np.zeros(histogram.shape, dtype=np.uint8)
+        return (np.log1p(histogram) * (255 / np.log1p(peak))).astype(np.uint8)
+
+    def draw_density(self, organisms):
+        """Draw prey, predator and food densities as one additive heatmap."""
+        count = len(organisms)
+        xs = np.fromiter((organism.x for organism in organisms), float, count)
+        ys = np.fromiter((organism.y for organism in organisms), float, count)
+        predators = np.fromiter((organism.food_types == 'prey' for organism in organisms), bool, count)
+
+        # Food only changes every few ticks, so its histogram is reused while the view is unchanged
+        food_key = (self.env.food_version, self.camera_x, self.camera_y, self.zoom_factor)
+        if self.food_density is None or self.food_density[0] != food_key:
+            food = np.array(self.env.get_food_positions(), dtype=float).reshape(-1, 2)
+            self.food_density = (food_key, self.density_intensity(self.density_histogram(food[:, 0], food[:, 1])))
+
+        prey_density = self.density_intensity(self.density_histogram(xs[~predators], ys[~predators]))
+        heatmap = np.zeros(prey_density.shape + (3,), dtype=np.uint8)
+        heatmap[..., 0] = self.density_intensity(self.density_histogram(xs[predators], ys[predators]))
+        heatmap[..., 1] = self.food_density[1]
+        heatmap[..., 2] = prey_density
+
+        density_surface = pygame.surfarray.make_surface(heatmap)
+        density_surface = pygame.transform.scale(
+            density_surface, (heatmap.shape[0] * self.lod_bin_size, heatmap.shape[1] * self.lod_bin_size))
+        self.screen.blit(density_surface, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+        self.organism_rects = []
 
     def update_population_history(self):
-        predators = sum(1 for organism in self.organisms if 'prey' in organism.dna.genes['food_types'])
+        predators = sum(1 for organism in self.organisms if 'prey' in organism.food_types)
         non_predators = len(self.organisms) - predators
         self.population_history.append((predators, non_predators))
 
-    def draw_population_graph(self):
+    def draw_overlays(self):
+        """Refresh the overlay graphs that are due and draw all of them from their cached surfaces."""
+        self.ui_scheduler.run(self.overlay_names)
+        self.screen.blits([blit for name in self.overlay_names for blit in self.overlay_blits.get(name, ())])
+
+    def refresh_overlays(self):
+        """Make every overlay graph due, e.g. when the overlays are shown again after being hidden."""
+        for name in self.overlay_names:
+            self.ui_scheduler.refresh_soon(name)
+
+    def render_population_graph(self):
         self.pop_graph_surface.fill((0, 0, 0, 0))  # Clear the population graph surface
 
         # Get the latest 1000 history entries or less if history is shorter
@@ -283,115 +579,52 @@ class Visualizer:
                              (i, self.pop_graph_surface.get_height() - predator_height),
                              (i, self.pop_graph_surface.get_height() - predator_height - non_predator_height), 2)
 
-        # Draw vertical label
-        label = self.font.render('Population', True, (255, 255, 255))
-        label = pygame.transform.rotate(label, 90)
-        self.screen.blit(label, (0, self.screen_height - 110))
+        # Vertical label and graph
+        self.overlay_blits['population'] = [
+            (self.graph_titles['population'], (0, self.screen_height - 110)),
+            (self.pop_graph_surface, (10, self.screen_height - 100)),  # Adjust position as needed
+        ]
 
-        self.screen.blit(self.pop_graph_surface, (10, self.screen_height - 100))  # Adjust position as needed
+    def render_histogram(self, name, values, bin_size, x_offset, bin_label):
+        """Render a histogram of gene values into the graph surface of the overlay `name`."""
+        graph_surface = self.graph_surfaces[name]
+        graph_surface.fill((0, 0, 0, 0))  # Clear the graph surface
+        if not values:
+            self.overlay_blits[name] = []
+            return
+        bins_count = int(max(values) / bin_size) + 1
+        bins = [0] * bins_count
 
-    def draw_metabolism_graph(self):
-        self.font = pygame.font.SysFont(None, 16)
-        bin_size = 0.1
-        metabolism_rates = [organism.dna.get_gene('metabolism_rate') for organism in self.organisms]
-        max_rate = max(metabolism_rates)
-        # min_rate = min(metabolism_rates)
-        bins_count = int(max_rate / bin_size) + 1
-        metabolism_bins = [0] * bins_count
+        for value in values:
+            bins[int(value / bin_size)] += 1
 
-        for metabolism_rate in metabolism_rates:
-            bin_index = int(metabolism_rate * 10)
-            metabolism_bins[bin_index] += 1
-
-        self.graph_surface.fill((0, 0, 0, 0))  # Clear the graph surface
-        max_value = max(metabolism_bins) if metabolism_bins else 1
+        max_value = max(bins)
 
         index = 1
-        for i, count in enumerate(metabolism_bins):
+        for i, count in enumerate(bins):
             if count > 0:
                 # Only draw and label bins that have organisms in them
                 index += 1
                 bar_height = int((count / max_value) * 100)
-                pygame.draw.rect(self.graph_surface, (255, 255, 255, 100),
-                                 (index * 20 - 2, 100 - bar_height, 18, bar_height))
-                label = self.font.render(f'{i / 10:.1f}', True, (255, 255, 255))
-                self.graph_surface.blit(label, (index * 20, 110))
+                pygame.draw.rect(graph_surface, (255, 255, 255, 100),
+                                 (x_offset + index * 20 - 2, 100 - bar_height, 18, bar_height))
+                label = self.graph_font.render(bin_label(i), True, (255, 255, 255))
+                graph_surface.blit(label, (x_offset + index * 20, 110))
 
-        # Draw vertical label
-        self.font = pygame.font.SysFont(None, 24)
-        label = self.font.render('Metabolism', True, (255, 255, 255))
-        label = pygame.transform.rotate(label, 90)
-        self.screen.blit(label, (0, 10))
-        self.screen.blit(self.graph_surface, (10, 10))
+        # Vertical label and graph
+        self.overlay_blits[name] = [(self.graph_titles[name], (x_offset, 10)), (graph_surface, (10, 10))]
 
-    def draw_food_sense_graph(self):
+    def render_metabolism_graph(self):
+        metabolism_rates = [organism.dna.get_gene('metabolism_rate') for organism in self.organisms]
+        self.render_histogram('metabolism', metabolism_rates, 0.1, 0, lambda i: f'{i / 10:.1f}')
 
-        self.font = pygame.font.SysFont(None, 16)
-        bin_size = 10
+    def render_food_sense_graph(self):
         sense_rates = [organism.dna.get_gene('food_sense_distance') for organism in self.organisms]
-        max_rate = max(sense_rates)
-        bins_count = int(max_rate / bin_size) + 1
-        sense_bins = [0] * bins_count
-
-        for sense_rate in sense_rates:
-            bin_index = int(sense_rate / 10)
-            sense_bins[bin_index] += 1
-
-        self.graph_surface.fill((0, 0, 0, 0))  # Clear the graph surface
-        max_value = max(sense_bins) if sense_bins else 1
-
-        index = 1
-        for i, count in enumerate(sense_bins):
-            if count > 0:
-                # Only draw and label bins that have organisms in them
-                index += 1
-                bar_height = int((count / max_value) * 100)
-                pygame.draw.rect(self.graph_surface, (255, 255, 255, 100),
-                                 (300 + index * 20 - 2, 100 - bar_height, 18, bar_height))
-                label = self.font.render(f'{i * 10}', True, (255, 255, 255))
-                self.graph_surface.blit(label, (300 + index * 20, 110))
-
-        # Draw vertical label
-        self.font = pygame.font.SysFont(None, 24)
-        label = self.font.render('Sense Distance', True, (255, 255, 255))
-        label = pygame.transform.rotate(label, 90)
-        self.screen.blit(label, (300, 10))
-        self.screen.blit(self.graph_surface, (10, 10))
-
-    def draw_activeness_graph(self):
-
-        self.font = pygame.font.SysFont(None, 16)
-        bin_size = 0.1
-        activness_rates = [organism.dna.get_gene('activeness') for organism in self.organisms]
-        max_rate = max(activness_rates)
-        # min_rate = min(metabolism_rates)
-        bins_count = int(max_rate / bin_size) + 1
-        activeness_bins = [0] * bins_count
+        self.render_histogram('food_sense', sense_rates, 10, 300, lambda i: f'{i * 10}')
 
-        for activness_rate in activness_rates:
-            bin_index = int(activness_rate * 10)
-            activeness_bins[bin_index] += 1
-
-        self.graph_surface.fill((0, 0, 0, 0))  # Clear the graph surface
-        max_value = max(activeness_bins) if activeness_bins else 1
-
-        index = 1
-        for i, count in enumerate(activeness_bins):
-            if count > 0:
-                # Only draw and label bins that have organisms in them
-                index += 1
-                bar_height = int((count / max_value) * 100)
-                pygame.draw.rect(self.graph_surface, (255, 255, 255, 100),
-                                 (600 + index * 20 - 2, 100 - bar_height, 18, bar_height))
-                label = self.font.render(f'{i / 10:.1f}', True, (255, 255, 255))
-                self.graph_surface.blit(label, (600 + index * 20, 110))
-
-        # Draw vertical label
-        self.font = pygame.font.SysFont(None, 24)
-        label = self.font.render('Activeness', True, (255, 255, 255))
-        label = pygame.transform.rotate(label, 90)
-        self.screen.blit(label, (600, 10))
-        self.screen.blit(self.graph_surface, (10, 10))
+    def render_activeness_graph(self):
+        activeness_rates = [organism.dna.get_gene('activeness') for organism in self.organisms]
+        self.render_histogram('activeness', activeness_rates, 0.1, 600, lambda i: f'{i / 10:.1f}')
 
     def draw_ui(self, ticks, organisms_count, avg_speed, avg_size):
         self.manager.draw_ui(self.screen)